@@ -0,0 +1,350 @@
+"""Benchmarks: scaling sweeps over the size of the input, with the time per
+operation, the peak memory, and a fitted complexity exponent for each sweep.
+
+Run them with `python -m coding.bench`, see `--help` for the options. Results
+can be saved as JSON, and compared against an earlier run to flag regressions.
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from coding.fields import FiniteField, PrimeField, PolynomialField, Integers, find_irreducible
+from coding.util import as_rest_table, euclides, is_prime, Poly, Symbol
+from coding.dlp import powermod, BruteForce, BabyStepGaintStep, CompactBabyStepGaintStep, \
+        PollardRho, ParallelRho, PohligHellman, IndexCalculus, Kangaroo
+
+
+class Benchmark:
+    """One scaling sweep. For every size in `sizes`, `setup(size)` prepares a state
+    (not timed), and `run(state)` is one operation on it.
+
+    With a `reset`, it is called with the state before every operation (not timed
+    either), e.g. to clear caches that would make a second run too cheap. `expect`
+    is the expected complexity exponent, for comparison with the fitted one.
+    """
+
+    def __init__(self, name, sizes, setup, run, reset=None, expect=None):
+        self.name = name
+        self.sizes = sizes
+        self.setup = setup
+        self.run = run
+        self.reset = reset
+        self.expect = expect
+
+    __str__ = __repr__ = lambda s: f'Benchmark({s.name})'
+
+    def measure(self, size, repeat=3, min_time=0.02) -> dict:
+        """Time per operation (the best of `repeat` rounds, in seconds) and the peak
+        memory of one operation (in bytes, as seen by tracemalloc).
+        """
+
+        state = self.setup(size)
+        number = 1
+        if self.reset is None:  # Repeat cheap operations until they take min_time
+            while True:
+                start = time.perf_counter()
+                for _ in range(number):
+                    self.run(state)
+                if time.perf_counter() - start >= min_time:
+                    break
+                number *= 2
+
+        best = math.inf
+        for _ in range(repeat):
+            if self.reset is not None:
+                self.reset(state)
+            start = time.perf_counter()
+            for _ in range(number):
+                self.run(state)
+            best = min(best, (time.perf_counter() - start) / number)
+
+        if self.reset is not None:
+            self.reset(state)
+        tracemalloc.start()
+        try:
+            self.run(state)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {'size': size, 'seconds': best, 'peak': peak}
+
+
+def fit_exponent(sizes, seconds):
+    """Slope of log(seconds) against log(size), by least squares: the k in
+    time ~ size^k. None if there are fewer than two sizes.
+    """
+    if len(sizes) < 2:
+        return None
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-12)) for t in seconds]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    sxx = sum((x - mx)**2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx
+
+
+def run_benchmarks(benchmarks, repeat=3, quick=False, output=None) -> dict:
+    """Runs all `benchmarks`, and returns the results by name. With `quick`, only
+    the two smallest sizes of every sweep are measured. Progress goes to `output`.
+    """
+
+    results = {}
+    for bench in benchmarks:
+        sizes = bench.sizes[:2] if quick else bench.sizes
+        points = []
+        for size in sizes:
+            points.append(bench.measure(size, repeat))
+            if output:
+                print(f"{bench.name} [{size}]: {_seconds(points[-1]['seconds'])}", file=output)
+        results[bench.name] = {
+            'points': points,
+            'exponent': fit_exponent([p['size'] for p in points], [p['seconds'] for p in points]),
+            'expect': bench.expect,
+        }
+    return results
+
+
+def compare(results, baseline, tolerance=0.25) -> list:
+    """Regressions of `results` against `baseline` (both from `run_benchmarks`): all
+    (name, size, old, new) where the time per operation grew by more than `tolerance`.
+    Benchmarks and sizes that only appear in one of them are ignored.
+    """
+
+    regressions = []
+    for name, result in results.items():
+        old = {p['size']: p['seconds'] for p in baseline.get(name, {}).get('points', [])}
+        for p in result['points']:
+            if p['size'] in old and p['seconds'] > old[p['size']] * (1 + tolerance):
+                regressions.append((name, p['size'], old[p['size']], p['seconds']))
+    return regressions
+
+
+def report(results, baseline=None) -> str:
+    "The results (and the change against `baseline`) as reST tables"
+    rows = [['benchmark', 'size', 'time/op', 'peak memory'] + (['change'] if baseline else [])]
+    for name, result in results.items():
+        old = {p['size']: p['seconds'] for p in (baseline or {}).get(name, {}).get('points', [])}
+        for p in result['points']:
+            row = [name, p['size'], _seconds(p['seconds']), _bytes(p['peak'])]
+            if baseline:
+                row.append(f"{p['seconds'] / old[p['size']] - 1:+.0%}" if p['size'] in old else '')
+            rows.append(row)
+
+    exponents = [['benchmark', 'exponent', 'expected']]
+    for name, result in results.items():
+        fitted, expect = result['exponent'], result['expect']
+        exponents.append([name, '' if fitted is None else f'{fitted:.2f}',
+                          '' if expect is None else expect])
+    return as_rest_table(rows) + '\n\n' + as_rest_table(exponents)
+
+
+def _seconds(t):
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if t >= scale:
+            return f'{t / scale:.3g} {unit}'
+    return f'{t / 1e-9:.3g} ns'
+
+def _bytes(n):
+    for unit, scale in [('MB', 2**20), ('kB', 2**10)]:
+        if n >= scale:
+            return f'{n / scale:.3g} {unit}'
+    return f'{n} B'
+
+
+# The benchmarks .............................................................
+
+def clear_caches():
+    "Clears the caches of this package, so they don't hide the cost of a second run"
+    from coding.util import algos
+    from coding.fields import polynomials, powers, finite
+    from coding.dlp import solvers
+    for f in [algos._euclides_cached, algos._factorize, polynomials._mod, finite._cached_field,
+              powers.fixed_base, solvers.baby_step_table, solvers.factor_base_logs]:
+        f.cache_clear()
+
+
+def safe_prime(bits: int) -> int:
+    "The smallest prime q >= 2^(bits-1) for which p = 2q + 1 is prime as well"
+    q = 2**(bits - 1)
+    while not (is_prime(q) and is_prime(2*q + 1)):
+        q += 1
+    return q
+
+
+def _dlp_setup(solver, primitive=False, **kwargs):
+    """A setup for DLPs with solver, in a group of prime order q ~ size (the squares
+    modulo the safe prime 2q + 1), or of order 2q with `primitive`.
+    """
+    def setup(size):
+        q = safe_prime(size.bit_length())
+        p = 2*q + 1
+        g = next(g for g in range(2, p) if pow(g, q, p) != 1 and pow(g, 2, p) != 1) \
+            if primitive else 4
+        N = 2*q if primitive else q
+        n = random.Random(size).randrange(N // 2, N)  # so BruteForce takes ~N steps
+        return solver, g, pow(g, n, p), p, N, kwargs
+    return setup
+
+def _dlp_run(state):
+    solver, g, G, p, N, kwargs = state
+    solver(g, G, p, order=N, **kwargs).solve()
+
+def _reset(state):
+    clear_caches()
+
+
+def _field_setup(p):
+    ff = FiniteField.modulo(p)
+    ff.tables  # build them outside of the timed runs
+    return ff
+
+def _mul_generators_reset(ff):
+    clear_caches()
+    ff.__dict__.pop('_primitive', None)
+    ff.__dict__.pop('order_factors', None)
+
+def _poly_setup(degree):
+    PF = PolynomialField(Symbol('X'), PrimeField(10007))
+    rnd = random.Random(degree)
+    f = Poly([rnd.randrange(1, 10007) for _ in range(2*degree + 1)], PF.X)
+    g = Poly([rnd.randrange(1, 10007) for _ in range(degree + 1)], PF.X)
+    return PF, f, g
+
+def _ints_setup(bits):
+    rnd = random.Random(bits)
+    return rnd.getrandbits(bits) | 1 << (bits - 1), rnd.getrandbits(bits) | 1
+
+def _kangaroo_setup(width):
+    p = 2**61 - 1
+    n = random.Random(width).randrange(10**6, 10**6 + width)
+    return Kangaroo, 37, pow(37, n, p), p, p - 1, {'a': 10**6, 'b': 10**6 + width}
+
+
+BENCHMARKS = [
+    Benchmark('FiniteField.modulo', [31, 61, 127, 251],
+              lambda p: p, FiniteField.modulo, expect=2),
+    Benchmark('FiniteField.modulo_poly', [4, 8, 16, 32],  # GF(2^n)
+              lambda q: (2, next(find_irreducible(2, q.bit_length() - 1))),
+              lambda args: FiniteField.modulo_poly(*args), reset=_reset, expect=2),
+    Benchmark('FiniteField.check', [31, 61, 127, 251],
+              FiniteField.modulo, FiniteField.check, expect=3),
+    Benchmark('FiniteField.mul_generators', [61, 127, 251, 509],
+              _field_setup, FiniteField.mul_generators, reset=_mul_generators_reset, expect=1),
+    Benchmark('PolynomialField.mul', [8, 16, 32, 64],
+              _poly_setup, lambda s: s[0].mul(s[1], s[2]), expect=2),
+    Benchmark('PolynomialField.divmod', [8, 16, 32, 64],
+              _poly_setup, lambda s: s[0].divmod(s[1], s[2]), expect=2),
+    Benchmark('euclides', [2**10, 2**11, 2**12, 2**13],  # bits
+              _ints_setup, lambda s: euclides(*s), reset=_reset),
+    Benchmark('powermod', [2**8, 2**9, 2**10, 2**11],  # bits of n and p
+              _ints_setup, lambda s: powermod(3, s[0], s[1])),
+    Benchmark('powermod(window=4)', [2**8, 2**9, 2**10, 2**11],
+              _ints_setup, lambda s: powermod(3, s[0], s[1], Integers, window=4)),
+    Benchmark('BruteForce', [2**10, 2**12, 2**14, 2**16],  # order of g
+              _dlp_setup(BruteForce), _dlp_run, expect=1),
+    Benchmark('BabyStepGaintStep', [2**16, 2**20, 2**24, 2**28],
+              _dlp_setup(BabyStepGaintStep), _dlp_run, expect=0.5),
+    Benchmark('CompactBabyStepGaintStep', [2**16, 2**20, 2**24, 2**28],
+              _dlp_setup(CompactBabyStepGaintStep), _dlp_run, reset=_reset, expect=0.5),
+    Benchmark('PollardRho', [2**16, 2**20, 2**24, 2**28],
+              _dlp_setup(PollardRho, seed=1), _dlp_run, expect=0.5),
+    Benchmark('ParallelRho', [2**16, 2**20, 2**24, 2**28],  # fixed processes, comparable anywhere
+              _dlp_setup(ParallelRho, seed=1, processes=2), _dlp_run, expect=0.5),
+    Benchmark('PohligHellman', [2**16, 2**20, 2**24, 2**28],
+              _dlp_setup(PohligHellman, primitive=True), _dlp_run, reset=_reset, expect=0.5),
+    Benchmark('IndexCalculus', [2**20, 2**26, 2**32, 2**38],
+              _dlp_setup(IndexCalculus, primitive=True, seed=1), _dlp_run, reset=_reset),
+    Benchmark('Kangaroo', [2**16, 2**20, 2**24, 2**28],  # width of the interval
+              _kangaroo_setup, _dlp_run, expect=0.5),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m coding.bench', description=__doc__.split('\n')[0])
+    parser.add_argument('-k', dest='pattern', default='',
+                        help="only run benchmarks with this in their name")
+    parser.add_argument('--repeat', type=int, default=3, help="rounds per size, the best one counts")
+    parser.add_argument('--quick', action='store_true', help="only the two smallest sizes")
+    parser.add_argument('--output', help="save the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against the results in this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="slowdown that counts as a regression (default: 0.25)")
+    parser.add_argument('--list', action='store_true', help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    benchmarks = [b for b in BENCHMARKS if args.pattern.lower() in b.name.lower()]
+    if args.list:
+        for b in benchmarks:
+            print(f"{b.name}: sizes {b.sizes}")
+        return 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    results = run_benchmarks(benchmarks, args.repeat, args.quick, output=sys.stderr)
+    print(report(results, baseline))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}, f, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, size, old, new in regressions:
+            print(f"Regression: {name} [{size}] {_seconds(old)} -> {_seconds(new)}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+
+import unittest
+
+class BenchTests(unittest.TestCase):
+    def test_fit_exponent(self):
+        sizes = [2**k for k in range(10, 20, 2)]
+        self.assertAlmostEqual(fit_exponent(sizes, [3e-6 * s**0.5 for s in sizes]), 0.5)
+        self.assertAlmostEqual(fit_exponent(sizes, [1e-9 * s**2 for s in sizes]), 2)
+        self.assertIsNone(fit_exponent([10], [1.0]))
+
+    def test_run_and_compare(self):
+        bench = Benchmark('sum', [1000, 4000], lambda n: list(range(n)), sum, expect=1)
+        results = run_benchmarks([bench], repeat=2)
+        points = results['sum']['points']
+        self.assertEqual([p['size'] for p in points], [1000, 4000])
+        self.assertTrue(all(p['seconds'] > 0 for p in points))
+        self.assertIn('sum', report(results, results))
+        self.assertEqual(compare(results, results), [])
+
+        slower = json.loads(json.dumps(results))
+        for p in slower['sum']['points']:
+            p['seconds'] *= 2
+        self.assertEqual([r[:2] for r in compare(slower, results)], [('sum', 1000), ('sum', 4000)])
+        self.assertEqual(compare(results, slower), [])
+
+    def test_every_solver(self):
+        from coding.dlp.solvers import DlpProblem
+        solvers, todo = set(), [DlpProblem]
+        while todo:
+            for cls in todo.pop().__subclasses__():
+                solvers.add(cls.__name__)
+                todo.append(cls)
+        self.assertLessEqual(solvers, {b.name for b in BENCHMARKS})
+
+    def test_dlp_setup(self):
+        solver, g, G, p, N, kwargs = _dlp_setup(BabyStepGaintStep)(2**12)
+        self.assertTrue(is_prime(N) and p == 2*N + 1)
+        self.assertEqual(pow(g, N, p), 1)
+        n = solver(g, G, p, order=N).solve()
+        self.assertEqual(pow(g, n, p), G)
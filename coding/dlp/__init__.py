@@ -1,3 +1,4 @@
 
 from .basics import *
 from .solvers import *
+from .jobs import *
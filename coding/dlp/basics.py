@@ -1,6 +1,7 @@
 
 import math
-from coding.fields import Integers
+from coding.fields import Integers, PrimeField, PolynomialField, FiniteField, square_and_multiply
+from coding.util import factorize, totient
 
 def bits(n):
     while n:
@@ -9,21 +10,124 @@ def bits(n):
         n ^= b
 
 
-def powermod(g, n: int, p, F=Integers):
-    "Calculates g**n (mod p). g and p should be part of F."
+def powermod(g, n: int, p, F=Integers, window=None):
+    """Calculates g**n (mod p) by square and multiply, reducing after every step.
+    g and p should be part of F. See `square_and_multiply` for `window`.
+    """
     assert g in F
     assert p in F
     
-    powers = list(bits(n))
-    results = [F.mod(F.pow(g, i), p) for i in powers]
-    res = F.one
-    for r in results:
-        res = F.mod(F.mul(res, r), p)
-    return res
+    # Integers modulo p, builtin pow is much faster
+    if window is None and isinstance(g, int) and isinstance(p, int) \
+            and (F is Integers or isinstance(F, PrimeField) and F.p == p):
+        return pow(g, n, p)
+    return square_and_multiply(F.mod(g, p), n, F.mod(F.one, p),
+                               lambda x, y: F.mod(F.mul(x, y), p), window)
+
+
+def group_order(p, F=Integers) -> int:
+    """Order of the multiplicative group modulo p: phi(p) for integers, and
+    q^deg(p) - 1 for polynomials over a field with q elements (p irreducible),
+    and q - 1 for a FiniteField with q elements (p zero).
+    """
+    if F is Integers or isinstance(F, PrimeField):
+        return totient(p)
+    if isinstance(F, FiniteField) and p == F.zero:  # the group of F itself
+        return F.q - 1
+    if isinstance(F, PolynomialField) and hasattr(F.F, 'q'):
+        return F.F.q ** int(p.degree()) - 1
+    raise ValueError(f"Unknown group order modulo {p} in {F}, give it explicitly")
+
+
+def element_order(g, p, F=Integers, N=None) -> int:
+    """Multiplicative order of g modulo p, given a multiple N of it (by default
+    the group order). Raises a ValueError if g^N isn't one.
+    """
+    if N is None:
+        N = group_order(p, F)
+    one = F.mod(F.one, p)
+    if powermod(g, N, p, F) != one:
+        raise ValueError(f"{g}^{N} != 1 (mod {p}), is {g} invertible?")
+    for r in factorize(N):
+        while N % r == 0 and powermod(g, N // r, p, F) == one:
+            N //= r
+    return N
+
+
+def linear_congruence(a: int, b: int, N: int):
+    "Generates all 0 <= x < N with a x = b (mod N), in increasing order"
+    d = math.gcd(a, N)
+    if b % d:
+        return
+    step = N // d
+    x = b // d * pow(a // d, -1, step) % step if step > 1 else 0
+    for k in range(d):
+        yield x + k * step
+
+
+def crt(residues) -> int:
+    """Chinese remainder theorem: the x modulo the product of the moduli with
+    x = r (mod m) for all (r, m) in `residues`. The moduli should be coprime.
+    """
+    x, M = 0, 1
+    for r, m in residues:
+        # x + M t = r (mod m)
+        t = (r - x) * pow(M, -1, m) % m if m > 1 else 0
+        x, M = x + M * t, M * m
+    return x % M
+
+
+
+def solve_sparse(rows, n: int, m: int):
+    """Solves a sparse linear system modulo m (not necessarily prime): `rows` are
+    pairs (coefficients, rhs), with the coefficients a dict {column: value}, and
+    there are n unknowns. Returns a list with the value of each unknown, or None
+    if the rows don't determine them all.
     
+    This is structured Gaussian elimination: columns are eliminated from the
+    sparsest one up, each time with the sparsest row in which that column has
+    an invertible coefficient, to keep the fill-in low.
+    """
+    
+    rows = [({c: v % m for c, v in coeffs.items() if v % m}, rhs % m) for coeffs, rhs in rows]
+    weight = [0] * n
+    for coeffs, _ in rows:
+        for c in coeffs:
+            weight[c] += 1
+    
+    pivots = []  # (column, coefficients, rhs), with coefficient 1 for column
+    for col in sorted(range(n), key=weight.__getitem__):
+        candidates = [i for i, (coeffs, _) in enumerate(rows)
+                      if col in coeffs and math.gcd(coeffs[col], m) == 1]
+        if not candidates:
+            return None
+        coeffs, rhs = rows.pop(min(candidates, key=lambda i: len(rows[i][0])))
+        inv = pow(coeffs[col], -1, m)
+        coeffs = {c: v * inv % m for c, v in coeffs.items()}
+        rhs = rhs * inv % m
+        pivots.append((col, coeffs, rhs))
+        
+        for i, (other, other_rhs) in enumerate(rows):
+            factor = other.get(col)
+            if factor:
+                for c, v in coeffs.items():
+                    value = (other.get(c, 0) - factor * v) % m
+                    if value:
+                        other[c] = value
+                    else:
+                        other.pop(c, None)
+                rows[i] = (other, (other_rhs - factor * rhs) % m)
+    
+    # Every pivot row only contains columns that were eliminated after it
+    x = [0] * n
+    for col, coeffs, rhs in reversed(pivots):
+        x[col] = (rhs - sum(v * x[c] for c, v in coeffs.items() if c != col)) % m
+    return x
+
 
 
 import unittest
+from coding.util import Poly, Symbol
 
 class DlpTests(unittest.TestCase):
     def test_bits(self):
@@ -31,3 +135,54 @@ class DlpTests(unittest.TestCase):
     
     def test_powermod(self):
         self.assertEqual(powermod(113, 221, 310), 193)
+    
+    def test_powermod_large(self):
+        p = 2**521 - 1
+        g, n = 3**200, 2**400 + 12345
+        for window in [None, 1, 4, 5]:
+            self.assertEqual(powermod(g, n, p, F=PrimeField(p), window=window), pow(g, n, p))
+        self.assertEqual(powermod(g, n, p), pow(g, n, p))
+        self.assertEqual(powermod(g, 0, p, F=PrimeField(p), window=4), 1)
+    
+    def test_powermod_polynomials(self):
+        X = Symbol('X')
+        PF = PolynomialField(X, FiniteField.modulo(2))
+        f = Poly([1, 0, 0, 1, 1], X)
+        self.assertEqual(powermod(Poly([1, 0], X), 2**100 * 15, f, F=PF), PF.one)
+        self.assertEqual(powermod(Poly([1, 0], X), 5, f, F=PF, window=3), Poly([1, 1, 0], X))
+    
+    def test_group_order(self):
+        self.assertEqual(group_order(149), 148)
+        self.assertEqual(group_order(310), 120)
+        X = Symbol('X')
+        PF = PolynomialField(X, FiniteField.modulo(3))
+        self.assertEqual(group_order(Poly([1, 0, 2, 2], X), PF), 26)
+        PF = PolynomialField(X, PrimeField(2**127 - 1))
+        self.assertEqual(group_order(Poly([1, 0, 0], X), PF), (2**127 - 1)**2 - 1)
+        ff = FiniteField.modulo(11)
+        self.assertEqual(group_order(ff.zero, ff), 10)
+        self.assertEqual(powermod(2, 10, ff.zero, ff), 1)
+        self.assertEqual(element_order(2, 7), 3)
+        self.assertEqual(element_order(3, 7), 6)
+        with self.assertRaises(ValueError):
+            element_order(2, 10)
+    
+    def test_linear_congruence(self):
+        self.assertEqual(list(linear_congruence(3, 4, 7)), [6])
+        self.assertEqual(list(linear_congruence(4, 6, 10)), [4, 9])
+        self.assertEqual(list(linear_congruence(4, 5, 10)), [])
+        self.assertEqual(list(linear_congruence(0, 0, 3)), [0, 1, 2])
+    
+    def test_solve_sparse(self):
+        # 2x + y = 3, x + 3y = 3, y = 2 (mod 7)
+        rows = [({0: 2, 1: 1}, 3), ({0: 1, 1: 3}, 3), ({1: 1}, 2)]
+        x = solve_sparse(rows, 2, 7)
+        self.assertEqual(x, [4, 2])
+        # Modulo 8, 2x has no invertible coefficient
+        self.assertIsNone(solve_sparse([({0: 2}, 4)], 1, 8))
+        self.assertEqual(solve_sparse([({0: 2}, 2), ({0: 3, 1: 1}, 1), ({1: 1}, 2)], 2, 8), [5, 2])
+    
+    def test_crt(self):
+        self.assertEqual(crt([(2, 3), (3, 5), (2, 7)]), 23)
+        self.assertEqual(crt([(0, 1), (4, 8)]), 4)
+        self.assertEqual(crt([]), 0)
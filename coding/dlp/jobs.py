@@ -0,0 +1,477 @@
+
+from collections import deque
+from concurrent.futures import CancelledError
+from contextlib import contextmanager
+from multiprocessing import connection
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from coding.fields import Integers, PrimeField
+from coding.util import factorize, is_prime
+from .basics import element_order
+from .solvers import CompactBabyStepGaintStep, BabyStepGaintStep, PollardRho, \
+        PohligHellman, IndexCalculus
+
+# Groups up to this order are solved with baby step, gaint step directly
+SMALL_GROUP = 2**24
+# From this size on, a prime factor of the order is too large for rho in Python
+LARGE_FACTOR = 2**40
+
+
+def choose_solver(g, p, F=Integers, order=None):
+    """Picks a solver for DLPs with base g modulo p, by the order N of g and how
+    smooth it is. Returns the DlpProblem subclass and extra arguments for it.
+
+    Small groups use baby step, gaint step. Prime fields with a large prime
+    factor in N use index calculus, other groups with a composite N use
+    Pohlig-Hellman, and a prime N uses Pollard's rho.
+    """
+
+    N = element_order(g, p, F, order)
+    if N < SMALL_GROUP:
+        return CompactBabyStepGaintStep, {'order': N}
+    largest = max(factorize(N))
+    if largest >= LARGE_FACTOR and (F is Integers or isinstance(F, PrimeField)) \
+            and is_prime(p) and N == p - 1:
+        return IndexCalculus, {'order': N}
+    if largest < N:
+        inner = BabyStepGaintStep if largest < SMALL_GROUP else PollardRho
+        return PohligHellman, {'order': N, 'inner': inner}
+    return PollardRho, {'order': N}
+
+
+class Job:
+    """A DLP to solve: n with g^n = G (mod p) in F. Without a `solver` (a
+    DlpProblem subclass), one is picked by `choose_solver`. The `kwargs` are
+    passed on to the solver, e.g. the interval of a Kangaroo.
+    """
+
+    def __init__(self, g, G, p, F=Integers, solver=None, timeout=None, id=None, **kwargs):
+        self.g, self.G, self.p, self.F = g, G, p, F
+        self.solver = solver
+        self.timeout = timeout  # seconds
+        self.id = id
+        self.kwargs = kwargs
+
+    __str__ = __repr__ = lambda s: f'Job({s.id}: {s.g}^n = {s.G} (mod {s.p}))'
+
+
+class Result:
+    "Outcome of a Job: either `n`, or the `error` (e.g. TimeoutError) that stopped it"
+
+    def __init__(self, job, n=None, error=None, solver=None, elapsed=None):
+        self.job = job
+        self.n = n
+        self.error = error
+        self.solver = solver  # name of the solver class
+        self.elapsed = elapsed  # seconds, in the worker
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    __str__ = __repr__ = lambda s: (f'Result({s.job.id}: n = {s.n})' if s.ok else
+                                    f'Result({s.job.id}: {type(s.error).__name__})')
+
+
+class Event:
+    """Progress of a batch, passed to the `on_event` callback of a JobRunner.
+    `kind` is 'submitted', 'solved', 'failed', 'timeout' or 'cancelled'.
+    """
+
+    def __init__(self, kind, job, result=None, done=0, total=0):
+        self.kind = kind
+        self.job = job
+        self.result = result
+        self.done = done  # jobs finished so far (including this one)
+        self.total = total
+        self.time = time.time()
+
+    __str__ = __repr__ = lambda s: f'Event({s.kind}, {s.job.id}, {s.done}/{s.total})'
+
+
+@contextmanager
+def _time_limit(seconds):
+    "Raises a TimeoutError in the block after `seconds`, where signals allow it"
+    if seconds is None or not hasattr(signal, 'setitimer') \
+            or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expire(signum, frame):
+        raise TimeoutError(f"No solution within {seconds} s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _run_job(job) -> Result:
+    "Solves a job, in a worker process"
+    start = time.perf_counter()
+    solver, kwargs = job.solver, {}
+    try:
+        with _time_limit(job.timeout):
+            if solver is None:
+                solver, kwargs = choose_solver(job.g, job.p, job.F, job.kwargs.get('order'))
+            n = solver(job.g, job.G, job.p, F=job.F, **{**kwargs, **job.kwargs}).solve()
+        return Result(job, n=n, solver=solver.__name__, elapsed=time.perf_counter() - start)
+    except Exception as e:
+        return Result(job, error=e, solver=getattr(solver, '__name__', None),
+                      elapsed=time.perf_counter() - start)
+
+
+def _serve(conn):
+    """Target of a worker process: solves the jobs it receives through `conn`,
+    until it gets None. Every job is announced with 'started', then its Result.
+    """
+    try:
+        for job in iter(conn.recv, None):
+            conn.send('started')
+            conn.send(_run_job(job))
+    except EOFError:  # the runner is gone
+        pass
+    finally:
+        conn.close()
+
+
+class _Worker:
+    """A long-lived worker process, which solves one job at a time. It is replaced
+    by a new process if its job has to be stopped.
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self._spawn()
+
+    def _spawn(self):
+        self.conn, child = self.context.Pipe()
+        self.process = self.context.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()  # so a crashed process shows up as EOF
+        self.job = None
+        self.deadline = None  # time.monotonic() at which the job has timed out
+
+    def assign(self, job):
+        self.conn.send(job)
+        self.job = job
+
+    def receive(self):
+        "The Result of the job, or None if the worker has only started it"
+        try:
+            message = self.conn.recv()
+        except (EOFError, OSError):
+            message = Result(self.job, error=RuntimeError(
+                f"The process solving {self.job} died with exit code {self.process.exitcode}"))
+            self.restart()
+        if not isinstance(message, Result):  # 'started'
+            if self.job.timeout is not None:
+                self.deadline = time.monotonic() + self.job.timeout
+            return None
+        message.job = self.job  # not the copy from the worker
+        self.job, self.deadline = None, None
+        return message
+
+    def restart(self):
+        "Stops the job (and the process), and starts a fresh process"
+        self.stop()
+        self._spawn()
+
+    def stop(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        "Lets an idle worker exit, or stops a busy one"
+        if self.job is None and self.process.is_alive():
+            try:
+                self.conn.send(None)
+                self.process.join(1)
+            except OSError:
+                pass
+        self.stop()
+
+
+class JobRunner:
+    """Solves batches of Jobs, with a pool of at most `processes` worker
+    processes, and streams the Results as they complete, through `run` or
+    `run_async`. The workers live for the whole batch, and are fed the jobs one
+    at a time.
+
+    `cancel` drops the jobs that haven't started, and stops the running ones by
+    terminating their worker, which is then replaced. A job's timeout is enforced
+    with SIGALRM in the worker where available, and otherwise in the same way, a
+    little later, by the runner. Every step is reported to `on_event` as an Event.
+    """
+
+    poll_interval = 0.05  # seconds between checks for cancellation
+    timeout_grace = 0.1  # seconds after a timeout before the runner stops the worker
+
+    def __init__(self, processes=None, on_event=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.on_event = on_event
+        self._cancelled = set()
+        self._cancel_all = False
+
+    def cancel(self, job_id=None):
+        """Cancels the job with this id, or all jobs of the current batch. Before
+        a batch is run, this cancels jobs of the next one.
+        """
+        if job_id is None:
+            self._cancel_all = True
+        else:
+            self._cancelled.add(job_id)
+
+    def _is_cancelled(self, job):
+        return self._cancel_all or job.id in self._cancelled
+
+    def _start(self, jobs):
+        self._context = multiprocessing.get_context()
+        self._waiting = deque(jobs)
+        self._workers = []
+        self._done, self._total = 0, len(jobs)
+        for i, job in enumerate(jobs):
+            if job.id is None:
+                job.id = i
+            self._emit('submitted', job, total=len(jobs))
+
+    def _running(self):
+        return [w for w in self._workers if w.job is not None]
+
+    def _step(self, timeout) -> list:
+        """Waits up to `timeout` seconds for running jobs to finish, handles the
+        cancellations and timeouts, and hands waiting jobs to idle workers.
+        Returns the Results that are done.
+        """
+
+        results = []
+        for worker in self._running():
+            if self._is_cancelled(worker.job):
+                job = worker.job
+                worker.restart()
+                results.append(self._finish(job, None))
+        for job in [j for j in self._waiting if self._is_cancelled(j)]:
+            self._waiting.remove(job)
+            results.append(self._finish(job, None))
+
+        while len(self._workers) < min(self.processes, len(self._waiting) + len(self._running())):
+            self._workers.append(_Worker(self._context))
+        for worker in self._workers:
+            if worker.job is None and self._waiting:
+                worker.assign(self._waiting.popleft())
+
+        running = self._running()
+        if running and not results:
+            deadlines = [w.deadline + self.timeout_grace for w in running if w.deadline is not None]
+            if deadlines:
+                timeout = max(0, min([timeout] + deadlines) - time.monotonic())
+            for conn in connection.wait([w.conn for w in running], timeout):
+                worker = next(w for w in running if w.conn is conn)
+                result = worker.receive()
+                if result is not None:
+                    results.append(self._finish(result.job, result))
+
+        now = time.monotonic()
+        for worker in self._running():
+            if worker.deadline is not None and now > worker.deadline + self.timeout_grace:
+                job = worker.job
+                worker.restart()
+                results.append(self._finish(job, Result(
+                    job, error=TimeoutError(f"No solution within {job.timeout} s"),
+                    elapsed=job.timeout)))
+        return results
+
+    def _finish(self, job, result) -> Result:
+        if result is None:
+            result, kind = Result(job, error=CancelledError()), 'cancelled'
+        else:
+            kind = 'solved' if result.ok else \
+                'timeout' if isinstance(result.error, TimeoutError) else 'failed'
+        self._done += 1
+        self._emit(kind, job, result, self._done, self._total)
+        return result
+
+    def _emit(self, kind, job, result=None, done=0, total=0):
+        if self.on_event is not None:
+            self.on_event(Event(kind, job, result, done, total))
+
+    def _stop(self):
+        for worker in self._workers:
+            worker.close()
+        self._workers, self._waiting = [], deque()
+        self._cancelled, self._cancel_all = set(), False
+
+    def _busy(self):
+        return self._waiting or self._running()
+
+    def run(self, jobs):
+        "Solves all `jobs`, and generates their Results in the order they complete"
+        self._start(list(jobs))
+        try:
+            while self._busy():
+                yield from self._step(self.poll_interval)
+        finally:
+            self._stop()
+
+    async def run_async(self, jobs):
+        """Like `run`, but as an asynchronous generator, which doesn't block the
+        event loop. Cancelling the task that consumes it stops all jobs.
+        """
+        self._start(list(jobs))
+        try:
+            while self._busy():
+                results = self._step(0)
+                for result in results:
+                    yield result
+                if not results:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            self._stop()
+
+
+def solve_all(jobs, processes=None, on_event=None) -> list:
+    "Solves all `jobs` in parallel (see JobRunner), and returns their Results in order"
+    results = {id(r.job): r for r in JobRunner(processes, on_event).run(jobs)}
+    return [results[id(job)] for job in jobs]
+
+
+
+import unittest
+from .solvers import BruteForce, Kangaroo
+
+class JobTests(unittest.TestCase):
+    def test_choose_solver(self):
+        self.assertIs(choose_solver(2, 1000003)[0], CompactBabyStepGaintStep)
+        solver, kwargs = choose_solver(7, 2**61 - 1)  # p - 1 is smooth
+        self.assertIs(solver, PohligHellman)
+        self.assertIs(kwargs['inner'], BabyStepGaintStep)
+        q = 2147483693  # 2q + 1 is prime too, so 4 has order q
+        self.assertIs(choose_solver(4, 2*q + 1)[0], PollardRho)
+        p = 2**64 - 59
+        g = next(g for g in range(2, 100) if element_order(g, p) == p - 1)
+        self.assertIs(choose_solver(g, p)[0], IndexCalculus)
+
+    def test_run(self):
+        events = []
+        jobs = [Job(2, pow(2, 123456, 1000003), 1000003, id='bsgs'),
+                Job(7, pow(7, 2**59 + 3, 2**61 - 1), 2**61 - 1, id='ph'),
+                Job(3, pow(3, 10**9 + 7, 2**61 - 1), 2**61 - 1, solver=Kangaroo,
+                    a=10**9, b=10**9 + 10**6, id='kangaroo'),
+                Job(2, 3, 7, id='none'),
+                Job(3, 5, 2**61 - 1, solver=BruteForce, timeout=0.2, id='slow')]
+        results = {r.job.id: r for r in JobRunner(2, events.append).run(jobs)}
+
+        self.assertEqual(pow(2, results['bsgs'].n, 1000003), pow(2, 123456, 1000003))
+        self.assertEqual(results['ph'].solver, 'PohligHellman')
+        self.assertEqual(results['kangaroo'].n, 10**9 + 7)
+        self.assertIsInstance(results['none'].error, ValueError)
+        self.assertIsInstance(results['slow'].error, TimeoutError)
+
+        kinds = [e.kind for e in events]
+        self.assertEqual(kinds.count('submitted'), 5)
+        self.assertEqual(kinds.count('solved'), 3)
+        self.assertEqual(sorted(kinds[5:]), ['failed', 'solved', 'solved', 'solved', 'timeout'])
+        self.assertEqual(events[-1].done, 5)
+
+    def test_async(self):
+        p = 1000003
+        jobs = [Job(2, pow(2, n, p), p) for n in [5, 500, 50000]]
+
+        async def collect():
+            return [r async for r in JobRunner(1).run_async(jobs)]
+
+        results = asyncio.run(collect())
+        self.assertEqual(sorted(r.n for r in results), [5, 500, 50000])
+
+    def test_cancel(self):
+        jobs = [Job(3, 5, 2**61 - 1, solver=BruteForce, timeout=0.5, id=i) for i in range(4)]
+        runner = JobRunner(1)
+        results = []
+        for result in runner.run(jobs):
+            results.append(result)
+            runner.cancel()
+        self.assertEqual(len(results), 4)
+        self.assertIsInstance(results[0].error, TimeoutError)
+        self.assertTrue(all(isinstance(r.error, CancelledError) for r in results[1:]))
+    
+    def test_cancel_running(self):
+        runner = JobRunner(1)
+        timer = threading.Timer(0.5, runner.cancel)
+        start = time.perf_counter()
+        timer.start()
+        try:
+            results = list(runner.run([Job(3, 5, 2**61 - 1, solver=BruteForce)]))
+        finally:
+            timer.cancel()
+        self.assertIsInstance(results[0].error, CancelledError)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(runner._workers, [])
+    
+    def test_cancel_async(self):
+        jobs = [Job(3, 5, 2**61 - 1, solver=BruteForce, id=i) for i in range(3)]
+        runner = JobRunner(2)
+        
+        async def collect():
+            results = []
+            async for result in runner.run_async(jobs):
+                results.append(result)
+            return results
+        
+        async def main():
+            task = asyncio.create_task(collect())
+            await asyncio.sleep(0.3)  # the loop isn't blocked by the jobs
+            runner.cancel(1)
+            await asyncio.sleep(0.3)
+            runner.cancel()
+            return await asyncio.wait_for(task, 5)
+        
+        results = asyncio.run(main())
+        self.assertEqual([r.job.id for r in results][0], 1)
+        self.assertTrue(all(isinstance(r.error, CancelledError) for r in results))
+        self.assertEqual(len(results), 3)
+
+    def test_workers_reused(self):
+        p = 1000003
+        pids = set()
+        runner = JobRunner(2, lambda e: pids.update(w.process.pid for w in runner._workers))
+        results = list(runner.run([Job(2, pow(2, n, p), p) for n in range(1, 9)]))
+        self.assertEqual(sorted(r.n for r in results), list(range(1, 9)))
+        self.assertEqual(len(pids), 2)
+    
+    def test_timeout_without_signals(self):
+        # the runner stops the worker itself, e.g. on Windows
+        from unittest import mock
+        from contextlib import nullcontext
+        if multiprocessing.get_start_method() != 'fork':
+            self.skipTest("the patch only reaches forked workers")
+        p = 1000003
+        jobs = [Job(3, 5, 2**61 - 1, solver=BruteForce, timeout=0.3, id='slow'),
+                Job(2, pow(2, 77, p), p, id='next')]
+        with mock.patch(f'{__name__}._time_limit', lambda seconds: nullcontext()):
+            results = {r.job.id: r for r in JobRunner(1).run(jobs)}
+        self.assertIsInstance(results['slow'].error, TimeoutError)
+        self.assertEqual(results['next'].n, 77)  # on a fresh worker
+    
+    def test_cancel_before_run(self):
+        p = 1000003
+        runner = JobRunner(1)
+        runner.cancel(1)
+        results = list(runner.run([Job(2, pow(2, n, p), p, id=n) for n in [1, 2]]))
+        self.assertIsInstance(next(r for r in results if r.job.id == 1).error, CancelledError)
+        self.assertEqual(next(r for r in results if r.job.id == 2).n, 2)
+        self.assertEqual(list(runner.run([Job(2, 4, p, id=1)]))[0].n, 2)  # only that batch
+    
+    def test_solve_all(self):
+        p = 1000003
+        jobs = [Job(2, pow(2, n, p), p) for n in [1, 2, 3]]
+        self.assertEqual([r.n for r in solve_all(jobs, 1)], [1, 2, 3])
@@ -1,18 +1,39 @@
 
+from concurrent.futures import CancelledError
+from functools import cached_property, lru_cache
 from itertools import count
+import hashlib
 import math
-from coding.fields import Integers, FiniteField
-from coding.util import euclides
-from .basics import powermod
+import multiprocessing
+import os
+import queue
+import random
+import zlib
+
+import numpy as np
+
+from coding.fields import Integers, FiniteField, PrimeField
+from coding.util import euclides, factorize, is_prime, primes_up_to, instance_memoize
+from .basics import powermod, element_order, linear_congruence, crt, solve_sparse
 
 class DlpProblem:
-    """Given g, G and p, calculate n so that g^n (mod p) = G"""
+    """Given g, G and p, calculate n so that g^n (mod p) = G.
     
-    def __init__(self, g, G, p, F=Integers):
+    `order` is the order of the group (or any multiple of the order of g). It's
+    only needed by some solvers, and computed when not given (see `group_order`).
+    """
+    
+    def __init__(self, g, G, p, F=Integers, order=None):
         self.g = g
         self.G = G
         self.p = p
         self.F = F
+        self._order = order
+    
+    @cached_property
+    def order(self):
+        "Multiplicative order of g, exponents only matter modulo this"
+        return element_order(self.g, self.p, self.F, self._order)
     
 
 class BruteForce(DlpProblem):
@@ -32,14 +53,18 @@ class BabyStepGaintStep(DlpProblem):
     Runs in O(sqrt(n)).
     """
     
-    def __init__(self, g, G, p, F=Integers):
-        super().__init__(g, G, p, F=F)
-        gcd, _, _ = euclides(g, p, F)
-        assert gcd == F.one, f"gcd(g, p) should be 1, but gcd({g}, {p}) = {gcd}"
+    def __init__(self, g, G, p, F=Integers, **kwargs):
+        super().__init__(g, G, p, F=F, **kwargs)
+        # Without a known order, Fermat's little theorem is used, so g has to be a
+        # unit. In a FiniteField itself (p is zero), every nonzero g is.
+        if self._order is None and p != F.zero:
+            gcd, _, _ = euclides(g, p, F)
+            assert gcd == F.one, f"gcd(g, p) should be 1, but gcd({g}, {p}) = {gcd}"
 
     def solve(self, output=False):
-        F = self.F
-        m = math.ceil(math.sqrt(self.p))
+        F, N = self.F, self._order
+        # ceil(sqrt(p)), also for huge p. With a known order, g^-m = g^(N-m).
+        m = math.isqrt((self.p if N is None else N) - 1) + 1
         if output: print(f"init: m = {m}")
         # Baby steps
         M = {}
@@ -51,8 +76,11 @@ class BabyStepGaintStep(DlpProblem):
         
         # Gaint steps
         # (uses little theorem of Fermat: g^(p-1) === 1 (mod p), assumes gcd(g, p) == 1)
-        power = F.mod(F.sub(F.neg(m), F.one)
-        orig_y = powermod(self.g, power, self.p), self.p, F=F)
+        if N is None:
+            power = F.mod(F.sub(F.neg(m), F.one), self.p)
+        else:
+            power = -m % N
+        orig_y = powermod(self.g, power, self.p, F=F)
         y = F.one
         if output:
             print("\n--> Gaint steps")
@@ -63,15 +91,522 @@ class BabyStepGaintStep(DlpProblem):
             if output: print(f"Step {k}: result = {res}")
             if res in M:
                 if output: print(f"Found solution at step {k}")
+                if N is not None:
+                    return (M[res] + k * m) % N
                 _M = F.from_int(M[res])
                 _k = F.from_int(k)
                 _m = F.from_int(m)
                 return F.mod(F.add(_M, F.mul(_k, _m)), self.p)
+            if N is not None and k >= m:
+                raise ValueError(f"No solution, {self.G} isn't a power of {self.g} (mod {self.p})")
             
             y = F.mod(F.mul(y, orig_y), self.p)
 
 
-# TODO: Pollard, IndexCalculus, Pohlig-Hellman
+class BabyStepTable:
+    """The baby steps g^0, ..., g^(m-1) (mod p) of baby step, gaint step, built
+    once to solve many DLPs with the same g and p.
+    
+    The table is kept as two sorted NumPy arrays: 64 bit keys and exponents.
+    Integers below 2^64 are their own key. Other elements are hashed down to 64
+    bits, so a match is verified before it's returned. This takes about 12 bytes
+    per baby step, instead of a dict of Python objects.
+    
+    m is the baby/gaint split: a larger table means fewer gaint steps per target
+    (N / m, for g of order N). By default m = ceil(sqrt(N)), and `memory` (in
+    bytes) limits it.
+    """
+    
+    def __init__(self, g, p, F=Integers, order=None, m=None, memory=None):
+        self.g, self.p, self.F = g, p, F
+        self.order = N = element_order(g, p, F, order)
+        if m is None:
+            m = math.isqrt(N - 1) + 1
+            if memory is not None:
+                m = min(m, memory // 12)
+        self.m = m = max(1, min(m, N))
+        
+        keys = np.empty(m, dtype=np.uint64)
+        x = F.mod(F.one, p)
+        for i in range(m):
+            keys[i] = self._key(x)
+            x = F.mod(F.mul(x, g), p)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.exponents = order.astype(np.uint32 if m < 2**32 else np.uint64)
+        self.gaint = powermod(g, -m % N, p, F)  # g^-m
+    
+    def _key(self, x):
+        if isinstance(x, int) and 0 <= x < 2**64:
+            return x
+        return int.from_bytes(hashlib.blake2b(str(x).encode(), digest_size=8).digest(), 'little')
+    
+    def _lookup(self, keys):
+        "Ranges [lo, hi) of the table that match the given keys"
+        keys = np.asarray(keys, dtype=np.uint64)
+        return (np.searchsorted(self.keys, keys, 'left'),
+                np.searchsorted(self.keys, keys, 'right'))
+    
+    def solve_many(self, targets, output=False) -> list:
+        """Solves g^n = G (mod p) for all G in `targets`, doing the gaint steps for
+        all of them at once. Raises a ValueError if some G isn't a power of g.
+        """
+        
+        F, p, N, m = self.F, self.p, self.order, self.m
+        targets = [F.mod(G, p) for G in targets]
+        res = [None] * len(targets)
+        todo = list(range(len(targets)))
+        ys = list(targets)  # G g^(-k m) for the targets in todo
+        
+        for k in range(-(-N // m)):
+            lo, hi = self._lookup([self._key(y) for y in ys])
+            still = []
+            for t, y, l, h in zip(todo, ys, lo, hi):
+                for i in self.exponents[l:h]:
+                    n = (int(i) + k * m) % N
+                    if powermod(self.g, n, p, F) == targets[t]:
+                        res[t] = n
+                        break
+                else:
+                    still.append((t, F.mod(F.mul(y, self.gaint), p)))
+            if output: print(f"Gaint step {k}: {len(todo) - len(still)} solved")
+            if not still:
+                return res
+            todo, ys = [t for t, _ in still], [y for _, y in still]
+        
+        raise ValueError(f"No solution for {[targets[t] for t in todo]}, these aren't powers of {self.g} (mod {p})")
+    
+    def solve(self, G, output=False):
+        return self.solve_many([G], output)[0]
+
+
+@instance_memoize('F', maxsize=8)
+def baby_step_table(g, p, F=Integers, order=None, m=None, memory=None) -> BabyStepTable:
+    """Cached BabyStepTable for (g, p, F), see BabyStepTable. Every field keeps
+    the 8 most recently used ones.
+    """
+    return BabyStepTable(g, p, F, order, m, memory)
+
+
+class CompactBabyStepGaintStep(DlpProblem):
+    """Baby step, gaint step with a compact table that is shared by all problems
+    with the same g and p (see BabyStepTable). Runs in O(sqrt(n)), but only the
+    first problem pays for the baby steps. `m` or `memory` (in bytes) size the
+    table, like in BabyStepTable.
+    """
+    
+    def __init__(self, g, G, p, F=Integers, order=None, m=None, memory=None):
+        super().__init__(g, G, p, F=F, order=order)
+        self.m = m
+        self.memory = memory
+    
+    def solve(self, output=False):
+        table = baby_step_table(self.g, self.p, self.F, self._order, self.m, self.memory)
+        return table.solve(self.G, output)
+
+
+def _element_hash(x) -> int:
+    "Hash of an element, that is the same in every process"
+    return x if isinstance(x, int) else zlib.crc32(str(x).encode())
+
+
+class PollardRho(DlpProblem):
+    """Pollard's rho with an r-adding walk and Brent's cycle detection. Runs in
+    O(sqrt(n)) expected time, with O(1) memory.
+    
+    The walk x -> x * M_j, with j the partition of x, keeps x = g^a G^b. When
+    it cycles, g^a G^b = g^a' G^b' gives a linear congruence for n modulo the
+    order of g. If it has many solutions, or none (G isn't a power of g), another
+    random walk is tried. Pass `seed` for reproducible walks.
+    """
+    
+    partitions = 20  # r, the number of multipliers M_j
+    attempts = 32  # random walks before giving up
+    max_candidates = 2**12  # solutions of the congruence that are tried
+    
+    def __init__(self, g, G, p, F=Integers, order=None, seed=None):
+        super().__init__(g, G, p, F=F, order=order)
+        self.random = random.Random(seed)
+    
+    def _mul(self, x, y):
+        return self.F.mod(self.F.mul(x, y), self.p)
+    
+    _hash = staticmethod(_element_hash)
+    
+    def _element(self, a, b):
+        "g^a G^b"
+        return self._mul(powermod(self.g, a, self.p, self.F),
+                         powermod(self.G, b, self.p, self.F))
+    
+    def _multipliers(self, N, rnd):
+        "The M_j = g^u G^v of a walk, as triples (M_j, u, v)"
+        steps = []
+        for _ in range(self.partitions):
+            u, v = rnd.randrange(N), rnd.randrange(N)
+            steps.append((self._element(u, v), u, v))
+        return steps
+    
+    def _step(self, state, steps, N):
+        x, a, b = state
+        M, u, v = steps[self._hash(x) % self.partitions]
+        return self._mul(x, M), (a + u) % N, (b + v) % N
+    
+    def _collide(self, N):
+        "Two triples (x, a, b) with the same x = g^a G^b, from a random walk"
+        steps = self._multipliers(N, self.random)
+        a, b = self.random.randrange(N), self.random.randrange(N)
+        tortoise = (self._element(a, b), a, b)
+        hare = self._step(tortoise, steps, N)
+        power = lam = 1
+        while tortoise[0] != hare[0]:
+            if power == lam:  # Brent: move the tortoise to the hare
+                tortoise = hare
+                power *= 2
+                lam = 0
+            hare = self._step(hare, steps, N)
+            lam += 1
+        return tortoise, hare
+    
+    def _from_collision(self, first, second, N):
+        "n from two different triples with the same x, or None"
+        (_, a1, b1), (_, a2, b2) = first, second
+        # g^a1 G^b1 = g^a2 G^b2, so n (b1 - b2) = a2 - a1 (mod N)
+        if math.gcd(b1 - b2, N) > self.max_candidates:
+            return None
+        G = self.F.mod(self.G, self.p)
+        for n in linear_congruence((b1 - b2) % N, (a2 - a1) % N, N):
+            if powermod(self.g, n, self.p, self.F) == G:
+                return n
+        return None
+    
+    def solve(self, output=False):
+        N = self.order
+        if output: print(f"init: order of g = {N}")
+        
+        for attempt in range(self.attempts):
+            first, second = self._collide(N)
+            if output: print(f"Walk {attempt}: {first[0]} = g^{first[1]} G^{first[2]}"
+                             f" = g^{second[1]} G^{second[2]}")
+            n = self._from_collision(first, second, N)
+            if n is not None:
+                if output: print(f"Found solution {n}")
+                return n
+        raise ValueError(f"No solution found, is {self.G} a power of {self.g} (mod {self.p})?")
+
+
+class ParallelRho(PollardRho):
+    """Pollard's rho with distinguished points (van Oorschot and Wiener), spread
+    over a pool of `processes` processes.
+    
+    Every task runs random walks with the same multipliers for a fixed number of
+    steps, and only reports the distinguished points it hits: those whose hash
+    has `bits` zero bits. Walks that meet end in the same distinguished point,
+    so a point that is reported twice (with other exponents) gives a relation, as
+    in PollardRho. The speedup is nearly linear in the number of processes.
+    
+    Everything random follows from `seed`, also which tasks are run. Setting
+    `cancel` (e.g. a threading.Event) from another thread stops `solve` with a
+    CancelledError, without waiting for the tasks that are running.
+    """
+    
+    tasks_per_process = 2  # tasks in flight, so workers never wait for us
+    poll_interval = 0.05  # seconds between checks of `cancel`
+    
+    def __init__(self, g, G, p, F=Integers, order=None, seed=None, processes=None, bits=None):
+        super().__init__(g, G, p, F=F, order=order, seed=seed)
+        self.processes = processes or os.cpu_count()
+        self.bits = bits
+    
+    def solve(self, output=False, cancel=None):
+        N = self.order
+        # Walks of about N^(1/4) steps, so about as many points are needed
+        bits = self.bits if self.bits is not None else N.bit_length() // 4
+        steps = self._multipliers(N, self.random)
+        budget = 2**bits * 16  # steps per task
+        max_tasks = 64 * math.isqrt(N) // budget + 64
+        if output: print(f"init: order of g = {N}, {bits} bits, {budget} steps per task")
+        
+        points = {}  # distinguished x -> (x, a, b)
+        pool = None
+        if self.processes > 1:
+            pool = multiprocessing.Pool(self.processes)
+            results = queue.Queue()  # lists of points, or the exception of a task
+        try:
+            pending = 0
+            for task in count():
+                if cancel is not None and cancel.is_set():
+                    raise CancelledError()
+                if task >= max_tasks:
+                    raise ValueError(f"No solution found, is {self.G} a power of {self.g} (mod {self.p})?")
+                args = (self, steps, N, bits, budget, self.random.getrandbits(64))
+                if pool is None:
+                    found = _distinguished_points(*args, cancel=cancel)
+                else:
+                    pool.apply_async(_distinguished_points, args,
+                                     callback=results.put, error_callback=results.put)
+                    pending += 1
+                    if pending < self.processes * self.tasks_per_process:
+                        continue
+                    found = self._next_result(results, cancel)
+                    pending -= 1
+                
+                for point in found:
+                    other = points.setdefault(point[0], point)
+                    if other[1:] == point[1:]:
+                        continue
+                    if output: print(f"Task {task}: {point[0]} = g^{point[1]} G^{point[2]}"
+                                     f" = g^{other[1]} G^{other[2]}")
+                    n = self._from_collision(point, other, N)
+                    if n is not None:
+                        if output: print(f"Found solution {n} after {len(points)} points")
+                        return n
+        finally:
+            if pool is not None:  # the tasks still running aren't needed anymore
+                pool.terminate()
+                pool.join()
+    
+    def _next_result(self, results, cancel):
+        "The points of the next task that finishes, checking `cancel` meanwhile"
+        while True:
+            try:
+                found = results.get(timeout=self.poll_interval)
+            except queue.Empty:
+                if cancel is not None and cancel.is_set():
+                    raise CancelledError() from None
+                continue
+            if isinstance(found, BaseException):
+                raise found
+            return found
+
+
+def _distinguished_points(problem, steps, N, bits, budget, seed, cancel=None):
+    """Runs random walks of `problem` (a ParallelRho) for `budget` steps, and
+    returns the distinguished points (x, a, b) they hit. In the same process,
+    `cancel` is checked every 1024 steps.
+    """
+    rnd = random.Random(seed)
+    mask = 2**bits - 1
+    points = []
+    state = None
+    for i in range(budget):
+        if cancel is not None and not i & 1023 and cancel.is_set():
+            raise CancelledError()
+        if state is None:
+            a, b = rnd.randrange(N), rnd.randrange(N)
+            state, length = (problem._element(a, b), a, b), 0
+        state = problem._step(state, steps, N)
+        length += 1
+        if (problem._hash(state[0]) // problem.partitions) & mask == 0:
+            points.append(state)
+            state = None
+        elif length > 20 * (mask + 1):  # probably stuck in a cycle without one
+            state = None
+    return points
+
+
+class Kangaroo(DlpProblem):
+    """Pollard's kangaroo (lambda) method, for n known to lie in [a, b]. Runs in
+    O(sqrt(b - a)) time, with O(1) memory.
+    
+    A tame kangaroo starts at g^b and makes a fixed number of jumps, to g^(b+d)
+    where it sets a trap. Every jump is by one of a few random distances s_j
+    (averaging sqrt(b - a) / 2), picked by the hash of the current element. A
+    wild kangaroo starts at G = g^n and jumps the same way. Once it lands on a
+    spot the tame one visited, it follows the same path into the trap, so then
+    n + d' = b + d. If it passes the trap, other distances are tried.
+    """
+    
+    jumps = 32  # the number of distances s_j
+    attempts = 16
+    
+    def __init__(self, g, G, p, a: int, b: int, F=Integers, order=None, seed=None):
+        super().__init__(g, G, p, F=F, order=order)
+        assert 0 <= a <= b, f"invalid interval [{a}, {b}]"
+        self.a, self.b = a, b
+        self.random = random.Random(seed)
+    
+    def _mul(self, x, y):
+        return self.F.mod(self.F.mul(x, y), self.p)
+    
+    def solve(self, output=False):
+        F, w = self.F, self.b - self.a
+        G = F.mod(self.G, self.p)
+        mean = max(1, math.isqrt(w) // 2)
+        if output: print(f"init: interval of width {w}, mean jump {mean}")
+        
+        for attempt in range(self.attempts):
+            distances = [self.random.randint(1, 2 * mean) for _ in range(self.jumps)]
+            jumps = [powermod(self.g, s, self.p, F) for s in distances]
+            
+            x, d = powermod(self.g, self.b, self.p, F), 0  # tame
+            for _ in range(4 * mean):
+                j = _element_hash(x) % self.jumps
+                x, d = self._mul(x, jumps[j]), d + distances[j]
+            if output: print(f"Attempt {attempt}: trap at g^(b + {d})")
+            
+            y, dw = G, 0  # wild
+            while dw <= w + d:
+                if y == x:
+                    n = self.b + d - dw
+                    if output: print(f"Caught after a distance of {dw}, found solution {n}")
+                    return n
+                j = _element_hash(y) % self.jumps
+                y, dw = self._mul(y, jumps[j]), dw + distances[j]
+        raise ValueError(f"No solution found in [{self.a}, {self.b}]")
+
+
+class PohligHellman(DlpProblem):
+    """Pohlig-Hellman: for every prime power q^e dividing the order N of g, n is
+    found modulo q^e one base-q digit at a time, each digit being a DLP in the
+    subgroup of order q. These are solved by `inner` (BabyStepGaintStep or
+    PollardRho), and the results are combined with the CRT. Runs in
+    O(sum e (log N + sqrt(q))), which is fast when N is smooth.
+    """
+    
+    def __init__(self, g, G, p, F=Integers, order=None, inner=BabyStepGaintStep):
+        super().__init__(g, G, p, F=F, order=order)
+        self.inner = inner
+    
+    def _pow(self, x, n):
+        return powermod(x, n, self.p, self.F)
+    
+    def solve(self, output=False):
+        F, N = self.F, self.order
+        factors = factorize(N)
+        if output: print(f"init: order of g = {N} = {factors}")
+        
+        residues = []
+        for q, e in factors.items():
+            # g_q has order q^e, gamma has order q
+            g_q, G_q = self._pow(self.g, N // q**e), self._pow(self.G, N // q**e)
+            gamma = self._pow(g_q, q**(e-1))
+            x = 0
+            for k in range(e):
+                # (g_q^-x G_q)^(q^(e-1-k)) = gamma^(digit k of n)
+                h = F.mod(F.mul(self._pow(g_q, q**e - x), G_q), self.p)
+                h = self._pow(h, q**(e-1-k))
+                d = self.inner(gamma, h, self.p, F, order=q).solve()
+                x += d * q**k
+            if output: print(f"n = {x} (mod {q}^{e})")
+            residues.append((x, q**e))
+        
+        n = crt(residues)
+        if self._pow(self.g, n) != F.mod(self.G, self.p):
+            raise ValueError(f"No solution, {self.G} isn't a power of {self.g} (mod {self.p})")
+        if output: print(f"Found solution {n}")
+        return n
+
+
+def _factor_smooth(x: int, base: list, product: int):
+    """{prime: exponent} of x > 0 if all its prime factors are in `base`, None
+    otherwise. `product` is the product of the base. Non-smooth x are rejected by
+    gcds with it, so trial division is only needed for the (rare) smooth ones.
+    """
+    y = x
+    while y > 1:
+        d = math.gcd(y, product)
+        if d == 1:
+            return None
+        y //= d
+    
+    exponents = {}
+    for q in base:
+        if x % q == 0:
+            e = 0
+            while x % q == 0:
+                x //= q
+                e += 1
+            exponents[q] = e
+    return exponents
+
+
+@lru_cache(maxsize=16)
+def factor_base_logs(g: int, p: int, bound: int) -> dict:
+    """Discrete logarithms of all primes up to `bound` to the base g modulo the
+    prime p, with g a generator, as {prime: log}. This is the expensive part of
+    index calculus, and it only depends on (g, p, bound), so it is cached.
+    
+    Relations g^k = prod q^e_q (mod p) are collected for random k, giving
+    k = sum e_q log(q) (mod p - 1). These are solved modulo every prime power
+    dividing p - 1, and combined with the CRT. Only primes below p are used, and
+    a ValueError is raised if the logs are still undetermined after
+    `IndexCalculus.max_rounds` rounds of extra relations.
+    """
+    
+    N = p - 1
+    base = primes_up_to(min(bound, p - 1))  # larger primes never divide g^k mod p
+    product = math.prod(base)
+    column = {q: i for i, q in enumerate(base)}
+    rnd = random.Random(f'{g} {p} {bound}')  # deterministic, like the cache
+    
+    relations = []
+    needed = len(base) + IndexCalculus.surplus
+    for _ in range(IndexCalculus.max_rounds):
+        while len(relations) < needed:
+            k = rnd.randrange(1, N)
+            exponents = _factor_smooth(pow(g, k, p), base, product)
+            if exponents is not None:
+                relations.append(({column[q]: e for q, e in exponents.items()}, k))
+        
+        solutions = [(solve_sparse(relations, len(base), q**e), q**e)
+                     for q, e in factorize(N).items()]
+        if all(x is not None for x, _ in solutions):
+            break
+        needed += IndexCalculus.surplus  # not all logs are determined yet
+    else:
+        raise ValueError(f"Couldn't determine the logs of the factor base up to {bound} "
+                         f"modulo {p} from {len(relations)} relations")
+    
+    return {q: crt([(x[i], m) for x, m in solutions]) for i, q in enumerate(base)}
+
+
+class IndexCalculus(DlpProblem):
+    """Index calculus, for a prime p and a generator g of GF(p)*. Runs in
+    subexponential time, L_p[1/2].
+    
+    First the logarithms of a factor base of small primes are found (see
+    `factor_base_logs`, which is cached for many G with the same g and p). Then,
+    in the descent step, random s are tried until G g^s is smooth, so that
+    log(G) follows from the logarithms of its prime factors.
+    """
+    
+    surplus = 10  # relations collected beyond the size of the factor base
+    max_rounds = 50  # of `surplus` more relations, before giving up
+    
+    def __init__(self, g, G, p, F=Integers, order=None, bound=None, seed=None):
+        super().__init__(g, G, p, F=F, order=order)
+        self.bound = bound or self.default_bound(p)
+        self.random = random.Random(seed)
+    
+    @staticmethod
+    def default_bound(p: int) -> int:
+        "L_p[1/2, 1/sqrt(2)], a balance between relation collection and algebra"
+        log = math.log(p)
+        return max(20, int(math.exp(math.sqrt(log * math.log(log) / 2))))
+    
+    def solve(self, output=False):
+        p, N = self.p, self.p - 1
+        if not (self.F is Integers or isinstance(self.F, PrimeField)) or not is_prime(p):
+            raise ValueError("Index calculus needs the integers modulo a prime p")
+        if self.order != N:
+            raise ValueError(f"{self.g} doesn't generate GF({p})*")
+        g, G = self.g % p, self.G % p
+        if G == 0:
+            raise ValueError(f"No solution, 0 isn't a power of {g} (mod {p})")
+        
+        logs = factor_base_logs(g, p, self.bound)
+        if output: print(f"init: factor base of {len(logs)} primes up to {self.bound}")
+        base = list(logs)
+        product = math.prod(base)
+        
+        for attempt in count(1):  # Descent
+            s = self.random.randrange(N)
+            exponents = _factor_smooth(G * pow(g, s, p) % p, base, product)
+            if exponents is not None:
+                if output: print(f"G g^{s} = {exponents} after {attempt} tries")
+                n = (sum(e * logs[q] for q, e in exponents.items()) - s) % N
+                if output: print(f"Found solution {n}")
+                return n
 
 
 import unittest
@@ -101,3 +636,217 @@ class BabyStepGaintStepTests(DlpSolveTests):
     def test_not_gcd_1(self):
         with self.assertRaises(AssertionError):
             self.cls(12, 23, 34).solve()
+    
+    def test_prime_field(self):
+        p = 1000003
+        F = PrimeField(p)
+        G = powermod(2, 123456, p, F)
+        n = self.cls(2, G, p, F).solve()
+        self.assertEqual(powermod(2, n, p, F), G)
+
+class CompactBabyStepGaintStepTests(DlpSolveTests):
+    cls = CompactBabyStepGaintStep
+    inputs = [(11, 101, 149),
+              (2, 123456, 1000003),
+              (3, 0, 7)]
+    
+    def test_many(self):
+        p = 1000003
+        table = BabyStepTable(2, p, m=100)  # small table, many gaint steps
+        ns = [0, 1, 99, 100, 5000, 999999, 500001]
+        self.assertEqual(table.solve_many([pow(2, n, p) for n in ns]), ns)
+        self.assertIs(baby_step_table(2, p), baby_step_table(2, p))
+    
+    def test_memory(self):
+        p = 1000003
+        G = pow(2, 777777, p)
+        self.assertEqual(self.cls(2, G, p, memory=12 * 100).solve(), 777777)
+        table = baby_step_table(2, p, memory=12 * 100)
+        self.assertEqual(table.m, 100)
+        self.assertIs(table, baby_step_table(2, p, memory=12 * 100))
+        self.assertIsNot(table, baby_step_table(2, p))
+    
+    def test_polynomials(self):
+        from coding.fields import PolynomialField
+        from coding.util import Poly, Symbol
+        X = Symbol('X')
+        PF = PolynomialField(X, FiniteField.modulo(2))
+        f = Poly([1, 0, 0, 0, 0, 0, 1, 1], X)
+        g = Poly([1, 1], X)
+        table = BabyStepTable(g, f, PF)
+        self.assertEqual(table.solve(powermod(g, 100, f, PF)), 100)
+    
+    def test_no_solution(self):
+        with self.assertRaises(ValueError):
+            BabyStepTable(2, 7).solve(3)
+
+
+class PollardRhoTests(DlpSolveTests):
+    cls = PollardRho
+    inputs = [(11, 101, 149),
+              (2, 123456, 1000003),
+              (113, 221, 310),
+              (3, 0, 7)]
+    
+    def test_prime_field(self):
+        p = 2**31 - 1
+        F = PrimeField(p)
+        G = powermod(7, 1234567890, p, F)
+        n = self.cls(7, G, p, F, seed=1).solve()
+        self.assertEqual(powermod(7, n, p, F), G)
+    
+    def test_polynomials(self):
+        from coding.fields import PolynomialField
+        from coding.util import Poly, Symbol
+        X = Symbol('X')
+        PF = PolynomialField(X, FiniteField.modulo(2))
+        f = Poly([1, 0, 0, 0, 0, 0, 1, 1], X)  # X^7 + X + 1
+        g = Poly([1, 1], X)
+        G = powermod(g, 100, f, PF)
+        n = self.cls(g, G, f, PF, seed=2).solve()
+        self.assertEqual(powermod(g, n, f, PF), G)
+    
+    def test_no_solution(self):
+        # 2 generates the squares modulo 7, 3 isn't one
+        with self.assertRaises(ValueError):
+            self.cls(2, 3, 7, seed=3).solve()
+
+
+class ParallelRhoTests(DlpSolveTests):
+    cls = ParallelRho
+    inputs = [(11, 101, 149),
+              (2, 123456, 1000003),
+              (3, 0, 7)]
+    
+    def test_processes(self):
+        p = 2**31 - 1
+        G = powermod(7, 1234567890, p)
+        for processes in [1, 2]:
+            n = self.cls(7, G, p, seed=4, processes=processes).solve()
+            self.assertEqual(powermod(7, n, p), G)
+    
+    def test_deterministic(self):
+        p = 1000003
+        G = powermod(2, 424242, p)
+        runs = [self.cls(2, G, p, seed=5, processes=1) for _ in range(2)]
+        self.assertEqual(runs[0].solve(), runs[1].solve())
+    
+    def test_cancel(self):
+        import threading
+        cancel = threading.Event()
+        cancel.set()
+        with self.assertRaises(CancelledError):
+            self.cls(7, 3, 2**31 - 1, processes=1).solve(cancel=cancel)
+    
+    def test_cancel_running(self):
+        import threading, time
+        p = 2**61 - 1  # far too large, every task takes long
+        for processes in [1, 2]:
+            cancel = threading.Event()
+            timer = threading.Timer(0.3, cancel.set)
+            start = time.perf_counter()
+            timer.start()
+            with self.assertRaises(CancelledError):
+                self.cls(3, 5, p, order=p - 1, processes=processes, bits=20).solve(cancel=cancel)
+            self.assertLess(time.perf_counter() - start, 3)
+    
+    def test_no_solution(self):
+        with self.assertRaises(ValueError):
+            self.cls(2, 3, 7, seed=6, processes=1).solve()
+
+
+class KangarooTests(unittest.TestCase):
+    def test_integers(self):
+        p = 2**61 - 1
+        for n, a, b in [(10**9 + 7, 10**9, 10**9 + 10**6), (5, 0, 10), (2**40, 2**40, 2**40)]:
+            G = powermod(3, n, p)
+            self.assertEqual(Kangaroo(3, G, p, a, b, seed=1).solve(), n)
+    
+    def test_finite_field(self):
+        from coding.fields import ZechField
+        from coding.util import Poly, Symbol
+        ff = ZechField.modulo_poly(2, Poly([1, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 1, 1, 1], Symbol('X')),
+                                   packed=True)  # GF(2^13), its group has prime order
+        g = ff.primitive_element()
+        G = ff.pow(g, 5000)
+        n = Kangaroo(g, G, ff.zero, 4000, 6000, F=ff, seed=2).solve()
+        self.assertEqual(ff.pow(g, n), G)
+    
+    def test_not_in_interval(self):
+        p = 1000003
+        with self.assertRaises(ValueError):
+            Kangaroo(2, pow(2, 500000, p), p, 0, 1000, seed=3).solve()
+
+
+class PohligHellmanTests(DlpSolveTests):
+    cls = PohligHellman
+    inputs = [(11, 101, 149),
+              (2, 123456, 1000003),
+              (3, 0, 7),
+              (7, 2**59 + 12345, 2**61 - 1)]
+    
+    def test_rho(self):
+        p = 2**61 - 1
+        G = powermod(37, 2**60 - 999, p)
+        n = self.cls(37, G, p, inner=PollardRho).solve()
+        self.assertEqual(powermod(37, n, p), G)
+    
+    def test_prime_power_order(self):
+        p = 257  # p - 1 = 2^8, one prime with a large exponent
+        G = powermod(3, 200, p)
+        self.assertEqual(self.cls(3, G, p).solve(), 200)
+    
+    def test_no_solution(self):
+        with self.assertRaises(ValueError):
+            self.cls(2, 3, 7).solve()
+    
+    def test_finite_field(self):
+        from coding.fields import ZechField
+        from coding.util import Poly, Symbol
+        zech = ZechField.modulo_poly(2, Poly([1, 0, 0, 0, 1, 1, 0, 1, 1], Symbol('X')), packed=True)
+        poly = FiniteField.modulo_poly(3, Poly([1, 0, 2, 2], Symbol('X')))
+        for ff in [zech, poly]:
+            g = ff.primitive_element()
+            for n in [0, 1, 7, len(ff) - 2]:
+                G = ff.pow(g, n)
+                self.assertEqual(self.cls(g, G, ff.zero, F=ff).solve(), n)
+
+
+class IndexCalculusTests(DlpSolveTests):
+    cls = IndexCalculus
+    inputs = [(2, 123456, 1000003),
+              (7, 2**30, 2**31 - 1),
+              (6, 1, 41)]
+    
+    def test_cached(self):
+        p = 1000003
+        logs = factor_base_logs(2, p, 50)
+        for q, n in logs.items():
+            self.assertEqual(pow(2, n, p), q)
+        for n in [1, 99999, 777777]:
+            self.assertEqual(self.cls(2, pow(2, n, p), p, bound=50).solve(), n)
+        self.assertIs(factor_base_logs(2, p, 50), logs)
+    
+    def test_not_a_generator(self):
+        with self.assertRaises(ValueError):
+            self.cls(4, 16, 1000003).solve()
+    
+    def test_small_p(self):
+        # The factor base would contain primes >= p, which never show up
+        self.assertEqual(self.cls(2, pow(2, 5, 11), 11).solve(), 5)
+        self.assertEqual(self.cls(3, pow(3, 5, 17), 17, bound=30).solve(), 5)
+        for p in [3, 5, 7, 13, 19]:
+            g = next(g for g in range(2, p) if element_order(g, p) == p - 1)
+            for n in range(p - 1):
+                self.assertEqual(self.cls(g, pow(g, n, p), p).solve(), n)
+    
+    def test_gives_up(self):
+        # one round of 5 relations can't determine the logs of the 15 primes below 50
+        p = 1000003
+        saved = IndexCalculus.max_rounds, IndexCalculus.surplus
+        IndexCalculus.max_rounds, IndexCalculus.surplus = 1, -10
+        try:
+            with self.assertRaisesRegex(ValueError, 'from 5 relations'):
+                factor_base_logs.__wrapped__(2, p, 50)
+        finally:
+            IndexCalculus.max_rounds, IndexCalculus.surplus = saved
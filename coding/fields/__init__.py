@@ -2,3 +2,12 @@
 from .base import *
 from .finite import *
 from .polynomials import *
+from .dense import *
+from .zech import *
+from .prime import *
+from .packed import *
+from .powers import *
+from .ntt import *
+from .irreducible import *
+from .mapped import *
+from .profile import *
@@ -1,7 +1,7 @@
 
 import math
 
-__all__ = ['Field', 'Reals', 'Integers']
+__all__ = ['Field', 'Reals', 'Integers', 'square_and_multiply']
 
 class Field:
     # Minimally; implement add, neg, mul, inv
@@ -22,28 +22,90 @@ class Field:
     def divmod(self, x, y):
         return self.div(x, y), self.mod(x, y)
     
-    def pow(self, x, n: int):
-        res = self.one
-        for i in range(n):
-            res = self.mul(res, x)
+    def inv_many(self, xs) -> list:
+        """Inverses of all `xs`, with a single `inv` (Montgomery's trick): the
+        prefix products are inverted at once, and then unwound with 3(n - 1)
+        multiplications. Fails like `inv` if one of them is zero.
+        """
+        
+        xs = list(xs)
+        if not xs:
+            return []
+        prefix = [xs[0]]
+        for x in xs[1:]:
+            prefix.append(self.mul(prefix[-1], x))
+        
+        acc = self.inv(prefix[-1])  # (x_0 ... x_i)^-1
+        res = [None] * len(xs)
+        for i in range(len(xs) - 1, 0, -1):
+            res[i] = self.mul(acc, prefix[i-1])
+            acc = self.mul(acc, xs[i])
+        res[0] = acc
         return res
     
+    def pow(self, x, n: int, window=None):
+        "x^n with O(log n) multiplications, see square_and_multiply"
+        if n < 0:
+            x, n = self.inv(x), -n
+        return square_and_multiply(x, n, self.one, self.mul, window)
+    
     def all_mod(self, x):
         s = set()
         for i in self:
             s.add(self.mod(i, x))
         return s
     
+    def element_str(self, x):
+        "How to display an element, e.g. in tables"
+        return str(x)
+    
     def from_int(self, i: int):
-        res = self.zero
-        for i in range(i):
-            res = self.add(res, self.one)
-        return res
+        "one + one + ... (i times), by doubling and adding"
+        res = square_and_multiply(self.one, abs(i), self.zero, self.add)
+        return self.neg(res) if i < 0 else res
     
     def __len__(self):
         return float('inf')
 
 
+def square_and_multiply(x, n: int, one, mul, window=None):
+    """x^n for n >= 0, given an associative `mul` with identity `one`, in O(log n)
+    multiplications. With a `window` of w > 1 bits, the odd powers x, x^3, ...,
+    x^(2^w - 1) are computed first, and runs of up to w bits of n are multiplied
+    in at once (sliding window). This saves multiplications for large n.
+    """
+    
+    assert n >= 0, "negative powers aren't supported"
+    bits = bin(n)[2:]
+    res = one
+    if not window or window == 1:
+        for b in bits:
+            res = mul(res, res)
+            if b == '1':
+                res = mul(res, x)
+        return res
+    
+    x2 = mul(x, x)
+    odd = [x]  # odd[k] = x^(2k + 1)
+    for _ in range(2**(window - 1) - 1):
+        odd.append(mul(odd[-1], x2))
+    i = 0
+    while i < len(bits):
+        if bits[i] == '0':
+            res = mul(res, res)
+            i += 1
+            continue
+        # The longest run of at most `window` bits that starts and ends with a 1
+        j = min(i + window, len(bits))
+        while bits[j-1] == '0':
+            j -= 1
+        for _ in range(j - i):
+            res = mul(res, res)
+        res = mul(res, odd[int(bits[i:j], 2) >> 1])
+        i = j
+    return res
+
+
 class _RealField(Field):
     one = 1
     zero = 0
@@ -60,7 +122,7 @@ class _RealField(Field):
     def mul(self, x, y):
         return x * y
     
-    def pow(self, x, n):
+    def pow(self, x, n, window=None):
         return math.pow(x, n)
     
     def div(self, x, y):
@@ -82,13 +144,14 @@ class _RealField(Field):
             return False
     
     __str__ = __repr__ = lambda s: 'Reals'
+    __reduce__ = lambda s: 'Reals'  # unpickle as the same object, for `is` checks
         
 
 Reals = _RealField()
 
 
 class _IntegerField(_RealField):
-    def pow(self, x, n):
+    def pow(self, x, n, window=None):
         return pow(x, n)
 
     def div(self, x, y):
@@ -110,6 +173,7 @@ class _IntegerField(_RealField):
             return False
     
     __str__ = __repr__ = lambda s: 'Integers'
+    __reduce__ = lambda s: 'Integers'
 
 Integers = _IntegerField()
 
@@ -0,0 +1,347 @@
+
+from itertools import product
+
+from coding.util import Poly, Symbol, euclides
+from .base import Integers
+from .polynomials import PolynomialField
+from .prime import PrimeField
+from .ntt import ntt_mul, ntt_divmod
+
+
+class DensePoly:
+    """A lightweight polynomial: its coefficients from low to high (without
+    trailing zeros) and its variable. Arithmetic is done by DensePolynomialField,
+    sympy is only used to display it.
+    """
+
+    __slots__ = ('coeffs', 'gen')
+
+    def __init__(self, coeffs: list, gen):
+        self.coeffs = coeffs
+        self.gen = gen
+
+    @classmethod
+    def from_poly(cls, f: Poly):
+        return cls([c for c in reversed(f.all_coeffs())] if not f.is_zero else [], f.gen)
+
+    def as_poly(self) -> Poly:
+        return Poly(self.all_coeffs() or [0], self.gen)
+
+    def degree(self):
+        "Degree, or -1 for the zero polynomial"
+        return len(self.coeffs) - 1
+
+    def all_coeffs(self):
+        "Coefficients from high to low, like sympy's Poly.all_coeffs"
+        return self.coeffs[::-1]
+
+    def __eq__(self, other):
+        return isinstance(other, DensePoly) and self.coeffs == other.coeffs \
+                and self.gen == other.gen
+
+    def __hash__(self):
+        return hash((tuple(self.coeffs), self.gen))
+
+    def __str__(self):
+        try:
+            return str(self.as_poly())
+        except Exception:  # coefficients sympy doesn't understand
+            return ' + '.join(f'({c})*{self.gen}**{i}' for i, c in enumerate(self.coeffs)) or '0'
+
+    __repr__ = lambda s: f'DensePoly({s.coeffs!r}, {s.gen})'
+
+
+class DensePolynomialField(PolynomialField):
+    """Like PolynomialField, but with DensePoly instead of sympy Poly as elements.
+    Multiplication is schoolbook or Karatsuba, division is done in place.
+
+    Over a PrimeField, large products and divisions use number theoretic
+    transforms instead (see `ntt_mul` and `ntt_divmod`).
+    """
+
+    key = staticmethod(lambda p: p.degree() + 1)
+
+    # Below this many coefficients, schoolbook multiplication is used
+    karatsuba_threshold = 32
+    # From this many coefficients on, NTTs are used (if possible)
+    ntt_threshold = 128
+
+    def __init__(self, X, F=Integers):
+        self.X = X
+        self.F = F
+        self._p = F.p if isinstance(F, PrimeField) else None
+        if self._p is None:
+            self.hgcd_threshold = self.hgcd_threshold_slow_mul
+        self.one = DensePoly([F.one], X)
+        self.zero = DensePoly([], X)
+
+    def convert(self, f: Poly) -> DensePoly:
+        "Converts a sympy Poly to a DensePoly of this field"
+        return self._new([int(c) if getattr(c, 'is_Integer', False) else c
+                          for c in DensePoly.from_poly(f).coeffs])
+
+    def _new(self, coeffs):
+        "DensePoly from a list of coefficients, which is normalized in place"
+        zero = self.F.zero
+        while coeffs and coeffs[-1] == zero:
+            coeffs.pop()
+        return DensePoly(coeffs, self.X)
+
+
+    # Operations ..........................................
+
+    def add(self, f, g):
+        F = self.F
+        a, b = f.coeffs, g.coeffs
+        if len(a) < len(b):
+            a, b = b, a
+        res = a[:]
+        for i, c in enumerate(b):
+            res[i] = F.add(res[i], c)
+        return self._new(res)
+
+    def neg(self, f):
+        return DensePoly([self.F.neg(c) for c in f.coeffs], self.X)
+
+    def mul(self, f, g):
+        if not f.coeffs or not g.coeffs:
+            return self.zero
+        return self._new(self._mul(f.coeffs, g.coeffs))
+
+    def _mul(self, a, b):
+        if self._p and min(len(a), len(b)) >= self.ntt_threshold:
+            p = self._p
+            A = [c % p for c in a]
+            res = ntt_mul(A, A if b is a else [c % p for c in b], p)
+            if res is not None:
+                return res
+        if min(len(a), len(b)) < self.karatsuba_threshold:
+            return self._schoolbook(a, b)
+        return self._karatsuba(a, b)
+
+    def _schoolbook(self, a, b):
+        F = self.F
+        if not a or not b:
+            return []
+        res = [F.zero] * (len(a) + len(b) - 1)
+        for i, x in enumerate(a):
+            if x != F.zero:
+                for j, y in enumerate(b):
+                    res[i + j] = F.add(res[i + j], F.mul(x, y))
+        return res
+
+    def _karatsuba(self, a, b):
+        F = self.F
+        h = max(len(a), len(b)) // 2
+        a0, a1, b0, b1 = a[:h], a[h:], b[:h], b[h:]
+        z0 = self._mul(a0, b0)
+        z2 = self._mul(a1, b1)
+        z1 = self._mul(self._add_lists(a0, a1), self._add_lists(b0, b1))
+        for z in (z0, z2):
+            for i, c in enumerate(z):
+                z1[i] = F.sub(z1[i], c)
+
+        res = [F.zero] * (len(a) + len(b) - 1)
+        for shift, z in ((0, z0), (h, z1), (2*h, z2)):
+            for i, c in enumerate(z[:len(res) - shift]):
+                res[i + shift] = F.add(res[i + shift], c)
+        return res
+
+    def _add_lists(self, a, b):
+        if len(a) < len(b):
+            a, b = b, a
+        res = a[:]
+        for i, c in enumerate(b):
+            res[i] = self.F.add(res[i], c)
+        return res
+
+    def divmod(self, f, g):
+        F = self.F
+        num, div = f.coeffs, g.coeffs
+        if not div:
+            raise ZeroDivisionError(f"Can't divide {f} by zero")
+        m = len(div) - 1
+        lead = div[-1]
+        if len(num) <= m:
+            return self.zero, f
+        if self._p and min(m, len(num) - m) >= self.ntt_threshold:
+            p = self._p
+            quot, rem = ntt_divmod([c % p for c in num], [c % p for c in div], p)
+            return self._new(quot), self._new(rem)
+
+        rem = num[:]  # the only copy, everything else happens in place
+        quot = [F.zero] * (len(num) - m)
+        for k in range(len(num) - m - 1, -1, -1):
+            c = rem[k + m]
+            if c == F.zero:
+                continue
+            factor = F.div(c, lead)
+            if F.sub(c, F.mul(factor, lead)) != F.zero:
+                raise ValueError(f"Can't divide {f} by {g} in {F}")
+            quot[k] = factor
+            for j in range(m):
+                rem[k + j] = F.sub(rem[k + j], F.mul(factor, div[j]))
+        del rem[m:]
+        return self._new(quot), self._new(rem)
+
+
+    # Half-GCD ............................................
+    # Matrices are ((a, b), (c, d)), acting on columns (A, B).
+
+    # Polynomials of at most this degree use the plain algorithm of Euclides. Without
+    # NTTs, multiplication is too slow for half_gcd to pay off much sooner.
+    hgcd_threshold = 256
+    hgcd_threshold_slow_mul = 8192
+
+    def _shift(self, f, k):
+        "f quo X^k"
+        return DensePoly(f.coeffs[k:], self.X)
+
+    def _apply(self, M, A, B):
+        (a, b), (c, d) = M
+        return (self.add(self.mul(a, A), self.mul(b, B)),
+                self.add(self.mul(c, A), self.mul(d, B)))
+
+    def _mat_mul(self, M, N):
+        (a, b), (c, d) = M
+        (e, f), (g, h) = N
+        return ((self.add(self.mul(a, e), self.mul(b, g)), self.add(self.mul(a, f), self.mul(b, h))),
+                (self.add(self.mul(c, e), self.mul(d, g)), self.add(self.mul(c, f), self.mul(d, h))))
+
+    def _step(self, M, q):
+        "((0, 1), (1, -q)) M, i.e. one step of Euclides"
+        (a, b), (c, d) = M
+        return (c, d), (self.sub(a, self.mul(q, c)), self.sub(b, self.mul(q, d)))
+
+    def half_gcd(self, A, B):
+        """For deg A > deg B, the matrix M so that M (A, B) are two consecutive
+        remainders in the algorithm of Euclides for A and B, the first of degree at
+        least m = ceil(deg A / 2) and the second of degree less than m.
+        """
+
+        m = (A.degree() + 1) // 2
+        M = ((self.one, self.zero), (self.zero, self.one))
+        if B.degree() < m:
+            return M
+        if A.degree() <= self.hgcd_threshold:
+            while B.degree() >= m:
+                q, r = self.divmod(A, B)
+                A, B = B, r
+                M = self._step(M, q)
+            return M
+
+        R = self.half_gcd(self._shift(A, m), self._shift(B, m))
+        A, B = self._apply(R, A, B)
+        if B.degree() < m:
+            return R
+        q, r = self.divmod(A, B)
+        R = self._step(R, q)
+        k = 2*m - B.degree()
+        S = self.half_gcd(self._shift(B, k), self._shift(r, k))
+        return self._mat_mul(S, R)
+
+    def fast_euclides(self, A, B):
+        """Same result as the plain algorithm of Euclides on A and B (before the sign
+        is normalized): the last nonzero remainder d, and s and t with
+        d = s*A + t*B. Uses half_gcd, which is subquadratic with fast multiplication.
+        """
+
+        M = ((self.one, self.zero), (self.zero, self.one))
+        while B != self.zero:
+            if A.degree() > B.degree():
+                R = self.half_gcd(A, B)
+                A, B = self._apply(R, A, B)
+                M = self._mat_mul(R, M)
+                if B == self.zero:
+                    break
+            q, r = self.divmod(A, B)
+            A, B = B, r
+            M = self._step(M, q)
+        return A, M[0][0], M[0][1]
+
+    def all_mod(self, f):
+        return {self._new(list(reversed(coeffs)))
+                for coeffs in product(*[self.F for _ in range(f.degree())])}
+
+    def __contains__(self, x):
+        return isinstance(x, DensePoly) \
+                and self.X == x.gen \
+                and all(c in self.F for c in x.coeffs)
+
+
+
+import unittest
+import random
+from coding.util.algos import _euclides_loop
+
+class DensePolyTests(unittest.TestCase):
+    def setUp(self):
+        from .finite import FiniteField
+        self.X = Symbol('X')
+        self.F7 = FiniteField.modulo(7)
+        self.PF = PolynomialField(self.X, self.F7)
+        self.DF = DensePolynomialField(self.X, self.F7)
+
+    def random_poly(self, degree):
+        return Poly([random.randrange(1, 7)] + [random.randrange(7) for _ in range(degree)], self.X)
+
+    def test_same_as_sympy(self):
+        random.seed(1)
+        for deg_f, deg_g in [(0, 0), (3, 5), (10, 4), (40, 37), (100, 70)]:
+            f, g = self.random_poly(deg_f), self.random_poly(deg_g)
+            df, dg = self.DF.convert(f), self.DF.convert(g)
+            self.assertEqual(self.DF.add(df, dg).as_poly(), self.PF.add(f, g))
+            self.assertEqual(self.DF.mul(df, dg).as_poly(), self.PF.mul(f, g))
+            q, r = self.DF.divmod(df, dg)
+            _q, _r = self.PF.divmod(f, g)
+            self.assertEqual((q.as_poly(), r.as_poly()), (_q, _r))
+
+    def test_ntt(self):
+        random.seed(4)
+        for p in [998244353, 10007]:
+            DF = DensePolynomialField(self.X, PrimeField(p))
+            f = DF._new([random.randrange(p) for _ in range(600)])
+            g = DF._new([random.randrange(p) for _ in range(300)])
+            self.assertEqual(DF.mul(f, g).coeffs, DF._schoolbook(f.coeffs, g.coeffs))
+            q, r = DF.divmod(DF.add(DF.mul(f, g), DF.one), g)
+            self.assertEqual((q, r), (f, DF.one))
+
+    def test_half_gcd(self):
+        random.seed(5)
+        for p in [2, 10007]:
+            DF = DensePolynomialField(self.X, PrimeField(p))
+            DF.hgcd_threshold = 8
+            for da, db, dg in [(50, 49, 0), (100, 100, 0), (120, 60, 30), (257, 256, 100)]:
+                g = DF._new([random.randrange(p) for _ in range(dg)] + [1])
+                a = DF.mul(DF._new([random.randrange(p) for _ in range(da)] + [1]), g)
+                b = DF.mul(DF._new([random.randrange(p) for _ in range(db)] + [1]), g)
+                r0, r1 = max(a, b, key=DF.key), min(a, b, key=DF.key)
+                self.assertEqual(DF.fast_euclides(r0, r1), _euclides_loop(r0, r1, DF))
+                d, s, t = euclides(a, b, DF)
+                self.assertEqual(DF.add(DF.mul(s, r0), DF.mul(t, r1)), d)
+                self.assertGreaterEqual(d.degree(), dg)
+
+    def test_cancel(self):
+        f = self.DF.convert(Poly([1, 2, 3], self.X))
+        self.assertEqual(self.DF.add(f, self.DF.neg(f)), self.DF.zero)
+        self.assertEqual(self.DF.key(self.DF.zero), 0)
+
+    def test_integers(self):
+        DF = DensePolynomialField(self.X)
+        f = DF.convert(Poly([3, 2, -2, 2], self.X))
+        g = DF.convert(Poly([1, 0, 4], self.X))
+        div, mod = DF.divmod(f, g)
+        self.assertEqual(div.as_poly(), Poly([3, 2], self.X))
+        self.assertEqual(mod.as_poly(), Poly([-14, -6], self.X))
+        with self.assertRaises(ValueError):
+            DF.divmod(DF.convert(Poly([10, 0, -4, 2, -2, 2], self.X)),
+                      DF.convert(Poly([2, 0, 1, 4], self.X)))
+
+    def test_finite_field(self):
+        from .finite import FiniteField
+        ff = FiniteField.modulo_poly(3, Poly([1, 0, 2, 2], self.X), dense=True)
+        self.assertEqual(len(ff), 27)
+        self.assertTrue(ff.check())
+        self.assertIn('X**2 + 2', ff.table_mono(ff.neg))
+        with self.assertRaises(ValueError):
+            FiniteField.modulo_poly(2, Poly([1, 0, 1], self.X), dense=True)
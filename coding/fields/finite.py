@@ -1,13 +1,27 @@
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
 from itertools import product
+import csv
+import io
+import math
+import os
+import sys
 
-from coding.util import euclides, as_rest_table, Poly, Symbol
+import numpy as np
+
+from coding.util import euclides, factorize, column_sizes, write_rest_table, Poly, Symbol, \
+        lru_memoize
 from .base import Field, Integers
 from .polynomials import PolynomialField
+from .dense import DensePolynomialField
+from .packed import PackedField, BinaryField
+from .powers import fixed_base
+from .irreducible import is_irreducible, find_primitive
 
 
 class FiniteField(Field):
-    def __init__(self, numbers: set, zero, one, add, neg, mul, inv):
+    def __init__(self, numbers: set, zero, one, add, neg, mul, inv, element_str=None):
         """Create a finite field. Not meant to be used directly."""
         
         assert zero in numbers
@@ -20,6 +34,8 @@ class FiniteField(Field):
         self._neg = neg
         self._mul = mul
         self._inv = inv
+        if element_str is not None:
+            self.element_str = element_str
     
     
     # Operations ..........................................
@@ -36,6 +52,11 @@ class FiniteField(Field):
     def inv(self, x):
         return self._inv[x]
     
+    def mod(self, x, y):
+        # Every x is a multiple of a nonzero y. With y zero, nothing is reduced,
+        # like for the integers, so p = zero works in e.g. powermod.
+        return x if y == self.zero else self.zero
+    
     def __iter__(self):
         yield self.zero
         yield self.one
@@ -47,115 +68,351 @@ class FiniteField(Field):
     def __len__(self):
         return len(self.numbers)
     
+    @property
+    def q(self):
+        "Number of elements, like `PrimeField.q`"
+        return len(self.numbers)
+    
     __str__ = __repr__ = lambda s: f'GF({len(s.numbers)})'
     
     
     # Generator and subgroup stuff ........................
     
     def mul_subgroup(self, gen):
-        return {self.pow(gen, i) for i in range(len(self))}
+        pw = fixed_base(gen, None, self)
+        return {pw(i) for i in range(len(self))}
+    
+    @cached_property
+    def order_factors(self):
+        "Factorization of q-1, the order of the multiplicative group, as {prime: exponent}"
+        return factorize(len(self) - 1)
+    
+    def _pow(self, x, n):
+        # Most bases are only used a few times here, too few for a FixedBase table
+        return self.pow(x, n)
+    
+    def order(self, x):
+        "Multiplicative order of x, i.e. the smallest n > 0 with x^n = 1"
+        if x == self.zero:
+            raise ValueError("zero has no multiplicative order")
+        n = len(self) - 1
+        for r, e in self.order_factors.items():
+            for _ in range(e):
+                if self._pow(x, n // r) != self.one:
+                    break
+                n //= r
+        return n
+    
+    def is_generator(self, x):
+        "Whether x generates the multiplicative group"
+        n = len(self) - 1
+        return x != self.zero and all(self._pow(x, n // r) != self.one
+                                      for r in self.order_factors)
+    
+    def primitive_element(self):
+        "A generator of the multiplicative group (always the same one)"
+        if not hasattr(self, '_primitive'):
+            self._primitive = next(x for x in self if self.is_generator(x))
+        return self._primitive
     
     def mul_generators(self):
-        mul_group = self.numbers - {self.zero}
-        return {el for el in self if self.mul_subgroup(el) == mul_group}
+        # The generators are exactly g^k with gcd(k, q-1) = 1
+        n = len(self) - 1
+        pw = fixed_base(self.primitive_element(), None, self)
+        return {pw(k) for k in range(1, n+1) if math.gcd(k, n) == 1}
+    
+    
+    # Batch operations ....................................
+    # The *_many_idx methods work on NumPy arrays of indices into `elements` instead
+    # of on elements, and are backed by dense tables of all operations.
+    
+    @cached_property
+    def elements(self):
+        "All elements in a fixed order, starting with zero and one."
+        return list(self)
+    
+    @cached_property
+    def index(self):
+        return {x: i for i, x in enumerate(self.elements)}
+    
+    def to_indices(self, xs):
+        return np.array([self.index[x] for x in xs], dtype=index_dtype(len(self)))
+    
+    def from_indices(self, idx):
+        return [self.elements[i] for i in np.ravel(idx)]
+    
+    @cached_property
+    def tables(self):
+        """Dense tables of the operations on indices: 'add' and 'mul' (q x q),
+        'neg' and 'inv' (q, where inv[0] is meaningless). These are built once,
+        so later changes to the field aren't reflected.
+        """
+        return self._dense_tables()
+    
+    def _dense_tables(self):
+        q, el, idx = len(self), self.elements, self.index
+        dtype = index_dtype(q)
+        add = np.empty((q, q), dtype=dtype)
+        mul = np.empty((q, q), dtype=dtype)
+        for i, a in enumerate(el):
+            add[i] = [idx[self.add(a, b)] for b in el]
+            mul[i] = [idx[self.mul(a, b)] for b in el]
+        neg = np.array([idx[self.neg(a)] for a in el], dtype=dtype)
+        inv = np.array([0] + [idx[self.inv(a)] for a in el[1:]], dtype=dtype)
+        return {'add': add, 'mul': mul, 'neg': neg, 'inv': inv}
+    
+    def save(self, path, p, modulus=None):
+        """Saves the dense tables to `path`, to be opened again (memory-mapped) as a
+        MappedField. `p` and `modulus` are the ones this field was constructed with.
+        """
+        from .mapped import write_tables  # avoid circular imports
+        write_tables(path, self, p, modulus)
+    
+    def add_many_idx(self, x, y):
+        return self.tables['add'][x, y]
+    
+    def neg_many_idx(self, x):
+        return self.tables['neg'][x]
+    
+    def mul_many_idx(self, x, y):
+        return self.tables['mul'][x, y]
+    
+    def inv_many_idx(self, x):
+        "Inverses of the indices x. Field.inv_many does the same for elements."
+        x = np.asarray(x)
+        if np.any(x == 0):
+            raise KeyError(self.zero)
+        return self.tables['inv'][x]
+    
+    def pow_many_idx(self, x, n):
+        "Square and multiply, for every element of x (and n, if it's an array)."
+        mul = self.tables['mul']
+        x, n = np.broadcast_arrays(np.asarray(x), np.asarray(n, dtype=np.int64))
+        assert np.all(n >= 0), "negative powers aren't supported"
+        res = np.ones(x.shape, dtype=mul.dtype)
+        base, n = x.astype(mul.dtype), n.copy()
+        while np.any(n):
+            res = np.where(n & 1, mul[res, base], res)
+            base = mul[base, base]
+            n >>= 1
+        return res
     
     
     # Tables and info .....................................
     
-    def table_binary(self, op):
-        n = list(self)
-        data = [[op.__name__] + list(map(str, n))]
-        for a in n:
-            row = [str(a)]
-            for b in n:
+    # The tables are streamed row by row. In a binary table, all cells are elements,
+    # so its columns are sized by the widest element, in one pass over the q elements.
+    
+    def _names(self):
+        "element_str of every element, by element"
+        return {x: self.element_str(x) for x in self}
+    
+    def _rows_binary(self, op, names):
+        name = lambda x: names[x] if x in names else self.element_str(x)
+        yield [op.__name__] + list(names.values())
+        for a, a_name in names.items():
+            row = [a_name]
+            for b in names:
                 try:
-                    row.append(str(op(a, b)))
+                    row.append(name(op(a, b)))
                 except KeyError:
                     row.append('/')
-            data.append(row)
-        return as_rest_table(data, full=True)
+            yield row
     
-    def table_mono(self, op):
-        n = list(self)
-        data = [[op.__name__] + list(map(str, n)), ['']]
-        for a in n:
+    def _rows_mono(self, op, names):
+        name = lambda x: names[x] if x in names else self.element_str(x)
+        yield [op.__name__] + list(names.values())
+        row = ['']
+        for a in names:
             try:
-                data[1].append(str(op(a)))
+                row.append(name(op(a)))
             except KeyError:
-                data[1].append(' ')
-        return as_rest_table(data, full=True)
-    
-    def table_powers(self, X):
-        data = [['pow'] + list(range(len(self))),
-                [str(X)] + [str(self.pow(X, i)) for i in range(len(self))]]
-        return as_rest_table(data, full=True)
-    
-    def info(self, X=None):
-        s = ''
-        s += f"Info for {self}"
-        s += '\n' + len(s)*'-'
-        s += f"\n\nAddition:\n\n{self.table_binary(self.add)}"
-        s += f"\n\nNegation:\n\n{self.table_mono(self.neg)}"
-        s += f"\n\nMultiplication:\n\n{self.table_binary(self.mul)}"
-        s += f"\n\nInversion:\n\n{self.table_mono(self.inv)}"
-        if X: s += f"\n\nPowers:\n\n{self.table_powers(X)}"
-        print(s)
+                row.append(' ')
+        yield row
+    
+    def _write_table(self, rows, sizes, file):
+        "Streams the rows to `file`, or returns them as a string if there is none"
+        if file is not None:
+            write_rest_table(file, rows, sizes, full=True)
+            return
+        buf = io.StringIO()
+        write_rest_table(buf, rows, sizes, full=True)
+        return buf.getvalue()[:-1]
+    
+    def table_binary(self, op, file=None):
+        names = self._names()
+        width = max(map(len, names.values()), default=0)
+        sizes = [max(len(op.__name__), width)] + [max(width, 1)] * len(names)
+        return self._write_table(self._rows_binary(op, names), sizes, file)
+    
+    def table_mono(self, op, file=None):
+        names = self._names()
+        sizes = column_sizes(self._rows_mono(op, names))
+        return self._write_table(self._rows_mono(op, names), sizes, file)
+    
+    def table_powers(self, X, file=None):
+        pw = fixed_base(X, None, self)
+        def rows():
+            yield ['pow'] + list(range(len(self)))
+            yield [self.element_str(X)] + [self.element_str(pw(i)) for i in range(len(self))]
+        return self._write_table(rows(), column_sizes(rows()), file)
+    
+    def info(self, X=None, file=None):
+        "Writes all tables to `file` (standard output by default), as they are computed"
+        file = file or sys.stdout
+        title = f"Info for {self}"
+        file.write(f"{title}\n{len(title)*'-'}\n")
+        file.write("\nAddition:\n\n")
+        self.table_binary(self.add, file)
+        file.write("\nNegation:\n\n")
+        self.table_mono(self.neg, file)
+        file.write("\nMultiplication:\n\n")
+        self.table_binary(self.mul, file)
+        file.write("\nInversion:\n\n")
+        self.table_mono(self.inv, file)
+        if X:
+            file.write("\nPowers:\n\n")
+            self.table_powers(X, file)
+    
+    def export_table(self, file, op='mul'):
+        """Exports the table of `op` ('add', 'mul', 'neg' or 'inv'). A file name ending
+        in .npy gets the dense table of indices into `elements` (see `tables`);
+        anything else, also a file object, gets CSV with the names of the elements.
+        """
+        
+        if isinstance(file, (str, os.PathLike)):
+            if os.fspath(file).endswith('.npy'):
+                np.save(file, self.tables[op])
+                return
+            with open(file, 'w', newline='') as f:
+                return self.export_table(f, op)
+        
+        rows = self._rows_binary if op in ('add', 'mul') else self._rows_mono
+        csv.writer(file).writerows(rows(getattr(self, op), self._names()))
     
     
     # Checks validness ....................................
+    # The checks work on (fresh) dense tables with NumPy. The ones on triples are
+    # done for a slab of values of `a` at a time, possibly spread over processes.
     
-    def check(self):
-        "Checks whether this instance of FiniteField is in fact an actual finite field."
+    def check(self, processes=None):
+        """Checks whether this instance of FiniteField is in fact an actual finite field.
+        Prints a counterexample for every condition that is not met.
+        
+        The expensive checks are spread over a pool of `processes` processes. By
+        default a pool is only used for larger fields.
+        """
+        
+        tables = self._dense_tables()
+        q = len(self)
+        if processes is None:
+            processes = 1 if q**3 <= CHECK_SLAB_SIZE * 8 else os.cpu_count()
         
         ok = True
-        for attr, func in type(self).__dict__.items():
-            if attr.startswith("check_"):
-                res = func(self)
-                if not res:
-                    print(f"Condition '{func.__doc__}' not met")
-                    ok = False
+        pool = None
+        if processes > 1:
+            pool = ProcessPoolExecutor(processes, initializer=_init_check_worker,
+                                       initargs=(tables,))
+        try:
+            for attr in dir(type(self)):
+                if attr.startswith("check_"):
+                    func = getattr(type(self), attr)
+                    res = func(self, tables, pool)
+                    if not res:
+                        print(f"Condition '{func.__doc__}' not met, e.g. for {res}")
+                        ok = False
+        finally:
+            if pool is not None:
+                pool.shutdown()  # _check_triples cancels what it doesn't need
         return ok
     
-    def check_add_assoc(self):
+    def _counterexample(self, condition, names, indices):
+        return Counterexample(condition, {n: self.element_str(self.elements[i])
+                                          for n, i in zip(names, indices)})
+    
+    def _check_pairs(self, condition, names, bad):
+        "Counterexample for the first True in the boolean array `bad`"
+        found = np.argwhere(bad)
+        if len(found) == 0:
+            return True
+        return self._counterexample(condition, names, found[0])
+    
+    def _check_triples(self, condition, kind, tables, pool):
+        q = len(self)
+        if q**2 <= CHECK_SLAB_SIZE:  # Slabs of several values of a
+            rows = CHECK_SLAB_SIZE // q**2
+            slabs = [(kind, start, min(start + rows, q), 0, q) for start in range(0, q, rows)]
+        else:  # Slabs of one a, and a range of b
+            cols = max(1, CHECK_SLAB_SIZE // q)
+            slabs = [(kind, a, a + 1, start, min(start + cols, q))
+                     for a in range(q) for start in range(0, q, cols)]
+        
+        futures = []
+        if pool is None:
+            results = (_check_slab(*slab, tables=tables) for slab in slabs)
+        else:
+            futures = [pool.submit(_check_slab, *slab) for slab in slabs]
+            results = (f.result() for f in futures)
+        try:
+            for res in results:
+                if res is not None:
+                    return self._counterexample(condition, 'abc', res)
+            return True
+        finally:
+            for f in futures:
+                f.cancel()
+    
+    def check_add_assoc(self, tables=None, pool=None):
         "associativity of addition"
-        return all(self.add(self.add(a, b), c) == self.add(a, self.add(b, c))
-                   for a, b, c in product(self, self, self))
+        tables = tables or self._dense_tables()
+        return self._check_triples(self.check_add_assoc.__doc__, 'add_assoc', tables, pool)
     
-    def check_add_comm(self):
+    def check_add_comm(self, tables=None, pool=None):
         "commutativity of addition"
-        return all(self.add(a, b) == self.add(b, a)
-                   for a, b in product(self, self))
+        A = (tables or self._dense_tables())['add']
+        return self._check_pairs(self.check_add_comm.__doc__, 'ab', A != A.T)
     
-    def check_add_neutral(self):
+    def check_add_neutral(self, tables=None, pool=None):
         "zero is neutral element for addition"
-        return all(self.add(self.zero, a) == a for a in self)
+        A = (tables or self._dense_tables())['add']
+        # zero has index 0
+        return self._check_pairs(self.check_add_neutral.__doc__, 'a', A[0] != np.arange(len(self)))
     
-    def check_add_negate(self):
+    def check_add_negate(self, tables=None, pool=None):
         "every element has an negated version"
-        return all(self.add(a, self.neg(a)) == self.zero for a in self)
+        tables = tables or self._dense_tables()
+        A, neg = tables['add'], tables['neg']
+        return self._check_pairs(self.check_add_negate.__doc__, 'a',
+                                 A[np.arange(len(self)), neg] != 0)
     
-    def check_mult_assoc(self):
+    def check_mult_assoc(self, tables=None, pool=None):
         "associativity of multiplication"
-        return all(self.mul(self.mul(a, b), c) == self.mul(a, self.mul(b, c))
-                   for a, b, c in product(self, self, self))
+        tables = tables or self._dense_tables()
+        return self._check_triples(self.check_mult_assoc.__doc__, 'mult_assoc', tables, pool)
     
-    def check_mult_comm(self):
+    def check_mult_comm(self, tables=None, pool=None):
         "commutativity of multiplication"
-        return all(self.mul(a, b) == self.mul(b, a) 
-                   for a, b in product(self, self))
+        M = (tables or self._dense_tables())['mul']
+        return self._check_pairs(self.check_mult_comm.__doc__, 'ab', M != M.T)
     
-    def check_mult_neutral(self):
+    def check_mult_neutral(self, tables=None, pool=None):
         "one is neutral element for multiplication"
-        return all(self.mul(self.one, a) == a for a in self)
+        M = (tables or self._dense_tables())['mul']
+        # one has index 1
+        return self._check_pairs(self.check_mult_neutral.__doc__, 'a', M[1] != np.arange(len(self)))
     
-    def check_mult_inverse(self):
+    def check_mult_inverse(self, tables=None, pool=None):
         "every element (except 0) has an inverse"
-        return all(self.mul(a, self.inv(a)) == self.one for a in self if a != self.zero)
+        tables = tables or self._dense_tables()
+        M, inv = tables['mul'], tables['inv']
+        bad = M[np.arange(len(self)), inv] != 1
+        bad[0] = False
+        return self._check_pairs(self.check_mult_inverse.__doc__, 'a', bad)
     
-    def check_distributive(self):
+    def check_distributive(self, tables=None, pool=None):
         "addition and multiplication are distributive"
-        return all(self.mul(self.add(a, b), c) == self.add(self.mul(a, c), self.mul(b, c))
-                   for a, b, c in product(self, self, self))
+        tables = tables or self._dense_tables()
+        return self._check_triples(self.check_distributive.__doc__, 'distributive', tables, pool)
 
     
     # Constructing with primes ............................
@@ -171,28 +428,178 @@ class FiniteField(Field):
         add = {(a, b): F.mod(F.add(a, b), p) for a, b in product(numbers, numbers)}
         mul = {(a, b): F.mod(F.mul(a, b), p) for a, b in product(numbers, numbers)}
         neg = {a: F.mod(F.neg(a), p) for a in numbers}
-        # inverse is a bit more difficult...
-        # We use the algorithm of Euclides 
-        inv = {}
-        for a in numbers - {F.zero}:
-            gcd, s, t = euclides(a, p, F)
-            gcd = F.mod(gcd, p)
-            if F.key(gcd) != 1:
-                raise ValueError(f"Invalid gcd (key({gcd}) = {F.key(gcd)} != 1), p (= {p}) isn't prime")
-            inv[a] = F.mod(t, p)
+        inv = _inverses_mod(numbers - {F.zero}, p, F)
         
         return cls(numbers, F.zero, F.one, add, neg, mul, inv)
     
     @classmethod
-    def modulo_poly(cls, p, poly, F=Integers):
+    def modulo_poly(cls, p, poly, F=Integers, packed=False, dense=False):
         """Creates a FiniteField based on polynomials. `p` should be prime.
         `poly` should be an irreducable polynomial in F_p.
+        
+        With `packed`, the elements are ints instead of polynomials (see
+        `PackedField`), but they are still displayed as polynomials. With `dense`,
+        the elements are DensePolys instead of sympy Polys.
+        
+        Over the integers, a reducible `poly` is rejected with a ValueError before
+        any tables are built (see `is_irreducible`).
         """
         
+        if F is Integers and not is_irreducible(poly, p):
+            raise ValueError(f"{poly.as_expr()} is reducible over GF({p})")
+        if packed:
+            assert F is Integers, "packed fields are only supported over the integers"
+            return cls.from_field(BinaryField(poly) if p == 2 else PackedField(p, poly))
+        
         F_p = cls.modulo(p, F)
+        if dense:
+            PF = DensePolynomialField(poly.gen, F_p)
+            return cls.modulo(PF.convert(poly), PF)
         PF = PolynomialField(poly.gen, F_p)
         return cls.modulo(poly, PF)
+    
+    @classmethod
+    def extension(cls, p, n, **kwargs):
+        """Creates GF(p^n) from the first polynomial of `find_primitive(p, n)`, so X
+        is a primitive element. `kwargs` are passed on to `modulo_poly`.
+        """
         
+        if n == 1:
+            return cls.modulo(p)
+        return cls.modulo_poly(p, next(find_primitive(p, n)), **kwargs)
+    
+    @classmethod
+    def cached(cls, p, poly=None, **kwargs):
+        """Like `modulo(p)`, or `modulo_poly(p, poly, **kwargs)` with a `poly`, but
+        fields that were built before are shared (see `_cached_field`). Only use
+        this for fields that are not modified afterwards.
+        """
+        return _cached_field(cls, p, poly, tuple(sorted(kwargs.items())))
+    
+    @classmethod
+    def from_field(cls, F):
+        """Creates a FiniteField from the operations of another finite Field `F`,
+        e.g. a PackedField. Raises a ValueError if `F` isn't actually a field.
+        """
+        
+        numbers = set(F)
+        add = {(a, b): F.add(a, b) for a, b in product(numbers, numbers)}
+        mul = {(a, b): F.mul(a, b) for a, b in product(numbers, numbers)}
+        neg = {a: F.neg(a) for a in numbers}
+        nonzero = list(numbers - {F.zero})
+        try:
+            inv = dict(zip(nonzero, F.inv_many(nonzero)))
+        except ZeroDivisionError:  # the product of all nonzero elements is zero
+            raise ValueError(f"{F} has zero divisors, this is not a field") from None
+        for a in nonzero:
+            if mul[(a, inv[a])] != F.one:
+                raise ValueError(f"{F.element_str(a)} has no inverse in {F}, this is not a field")
+        
+        return cls(numbers, F.zero, F.one, add, neg, mul, inv, element_str=F.element_str)
+        
+
+@lru_memoize(maxsize=32)
+def _cached_field(cls, p, poly, kwargs):
+    if poly is None:
+        return cls.modulo(p, **dict(kwargs))
+    return cls.modulo_poly(p, poly, **dict(kwargs))
+
+
+def _inverses_mod(numbers, p, F):
+    """Inverses of the nonzero `numbers` modulo p in F, as a dict. For integers,
+    inv[i] = -(p // i) * inv[p % i] gives all of them in linear time. Otherwise
+    Montgomery's trick (see `Field.inv_many`) needs only one Euclides.
+    Raises a ValueError if p isn't prime.
+    """
+    
+    if F is Integers and numbers == set(range(1, p)):
+        inv = [0, 1][:p]
+        for i in range(2, p):
+            q, r = divmod(p, i)
+            if r == 0:
+                raise ValueError(f"{i} divides p (= {p}), p isn't prime")
+            inv.append(-q * inv[r] % p)
+        return dict(enumerate(inv[1:], start=1))
+    
+    numbers = list(numbers)
+    if not numbers:
+        return {}
+    prefix = [numbers[0]]
+    for a in numbers[1:]:
+        prefix.append(F.mod(F.mul(prefix[-1], a), p))
+    # We use the algorithm of Euclides, once
+    gcd, s, t = euclides(prefix[-1], p, F)
+    gcd = F.mod(gcd, p)
+    if F.key(gcd) != 1:
+        raise ValueError(f"Invalid gcd (key({gcd}) = {F.key(gcd)} != 1), p (= {p}) isn't prime")
+    acc = F.mod(t if gcd == F.one else F.div(t, gcd), p)  # prefix[-1]^-1
+    
+    inv = {}
+    for i in range(len(numbers) - 1, 0, -1):
+        inv[numbers[i]] = F.mod(F.mul(acc, prefix[i-1]), p)
+        acc = F.mod(F.mul(acc, numbers[i]), p)
+    inv[numbers[0]] = acc
+    return inv
+
+
+class Counterexample:
+    """Result of a failed check: the condition and the elements for which it fails.
+    It is falsy, so it can be used like the result of a successful check (True).
+    """
+    
+    def __init__(self, condition, elements: dict):
+        self.condition = condition
+        self.elements = elements
+    
+    def __bool__(self):
+        return False
+    
+    def __str__(self):
+        return ', '.join(f'{n} = {x}' for n, x in self.elements.items())
+    
+    __repr__ = lambda s: f'Counterexample({s.condition!r}, {s.elements!r})'
+
+
+# Maximum number of elements of the (temporary) arrays in a slab of a check
+CHECK_SLAB_SIZE = 2**21
+
+_worker_tables = None
+
+def _init_check_worker(tables):
+    global _worker_tables
+    _worker_tables = tables
+
+def _check_slab(kind, start, stop, b_start, b_stop, tables=None):
+    """Checks a condition on triples (a, b, c) with start <= a < stop and
+    b_start <= b < b_stop. Returns the indices of the first counterexample, or None.
+    """
+    
+    if tables is None:
+        tables = _worker_tables
+    A, M = tables['add'], tables['mul']
+    a, b = slice(start, stop), slice(b_start, b_stop)
+    if kind == 'add_assoc':
+        lhs, rhs = A[A[a, b]], A[a][:, A[b]]
+    elif kind == 'mult_assoc':
+        lhs, rhs = M[M[a, b]], M[a][:, M[b]]
+    elif kind == 'distributive':
+        # (a + b) c == a c + b c
+        lhs = M[A[a, b]]
+        rhs = A[M[a][:, None, :], M[None, b, :]]
+    else:
+        raise ValueError(f"Unknown check {kind!r}")
+    
+    found = np.argwhere(lhs != rhs)
+    if len(found) == 0:
+        return None
+    i, j, k = found[0]
+    return start + i, b_start + j, k
+
+
+def index_dtype(q):
+    "Smallest dtype to store the indices of a field with q elements"
+    return np.uint16 if q <= 2**16 else np.uint32
+
 
 
 import unittest
@@ -218,6 +625,37 @@ class FiniteFieldTests(unittest.TestCase):
         ff._mul[(3, 2)] = 18
         self.assertFalse(ff.check())
     
+    def test_field_check_counterexample(self):
+        ff = FiniteField.modulo(13)
+        ff._mul[(3, 2)] = ff._mul[(2, 3)] = 5
+        res = ff.check_mult_assoc()
+        self.assertFalse(res)
+        a, b, c = (res.elements[n] for n in 'abc')
+        self.assertNotEqual(ff.mul(ff.mul(int(a), int(b)), int(c)),
+                            ff.mul(int(a), ff.mul(int(b), int(c))))
+        self.assertTrue(ff.check_add_assoc())
+    
+    def test_field_check_processes(self):
+        ff = FiniteField.modulo(31)
+        self.assertTrue(ff.check(processes=2))
+        ff._add[(4, 5)] = ff._add[(5, 4)] = 0
+        self.assertFalse(ff.check(processes=2))
+    
+    def test_field_check_small_slabs(self):
+        # Slabs smaller than q^2, so they are split over b as well
+        import coding.fields.finite as finite
+        ff = FiniteField.modulo(13)
+        size, finite.CHECK_SLAB_SIZE = finite.CHECK_SLAB_SIZE, 50
+        try:
+            self.assertTrue(ff.check())
+            ff._mul[(3, 2)] = ff._mul[(2, 3)] = 5
+            res = ff.check_mult_assoc()
+            self.assertFalse(res)
+            a, b, c = (int(res.elements[n]) for n in 'abc')
+            self.assertNotEqual(ff.mul(ff.mul(a, b), c), ff.mul(a, ff.mul(b, c)))
+        finally:
+            finite.CHECK_SLAB_SIZE = size
+    
     def test_poly_field_16(self):
         g = Poly([1, 0, 0, 1, 1], Symbol('X'))
         ff = FiniteField.modulo_poly(2, g)
@@ -229,8 +667,119 @@ class FiniteFieldTests(unittest.TestCase):
         ff = FiniteField.modulo_poly(3, g)
         self.assertTrue(ff.check())
     
+    def test_mul_generators(self):
+        ff = FiniteField.modulo(7)
+        self.assertEqual(ff.mul_subgroup(2), {1, 2, 4})
+        self.assertEqual(ff.mul_generators(), {3, 5})
+        self.assertEqual(FiniteField.modulo(2).mul_generators(), {1})
+    
+    def test_order(self):
+        ff = FiniteField.modulo(13)
+        self.assertEqual(ff.order_factors, {2: 2, 3: 1})
+        for x in range(1, 13):
+            self.assertEqual(ff.order(x), len(ff.mul_subgroup(x)))
+            self.assertEqual(ff.is_generator(x), ff.order(x) == 12)
+        self.assertTrue(ff.is_generator(ff.primitive_element()))
+        self.assertEqual(ff.mul_generators(), {x for x in range(1, 13) if ff.order(x) == 12})
+    
+    def test_pow_from_int(self):
+        ff = FiniteField.modulo_poly(3, Poly([1, 0, 2, 2], Symbol('X')))
+        for x in ff:
+            for n in [0, 1, 2, 5, 26, 27, 1000]:
+                expected = ff.one
+                for _ in range(n):
+                    expected = ff.mul(expected, x)
+                self.assertEqual(ff.pow(x, n), expected)
+                self.assertEqual(ff.pow(x, n, window=3), expected)
+        self.assertEqual(ff.from_int(10**20), ff.one)  # 10^20 = 1 (mod 3)
+        self.assertEqual(FiniteField.modulo(7).from_int(-3), 4)
+        self.assertEqual(FiniteField.modulo(7).pow(3, -1), 5)
+    
+    def test_inverses(self):
+        for ff in [FiniteField.modulo(101),
+                   FiniteField.modulo_poly(5, Poly([1, 0, 2], Symbol('X'))),
+                   FiniteField.modulo_poly(3, Poly([1, 0, 2, 2], Symbol('X')), dense=True)]:
+            for a in ff.numbers - {ff.zero}:
+                self.assertEqual(ff.mul(a, ff.inv(a)), ff.one)
+        with self.assertRaises(ValueError):
+            FiniteField.modulo(91)
+    
+    def test_inv_many_elements(self):
+        ff = FiniteField.modulo_poly(3, Poly([1, 0, 2, 2], Symbol('X')))
+        nonzero = list(ff.numbers - {ff.zero})
+        self.assertEqual(ff.inv_many(nonzero), [ff.inv(a) for a in nonzero])
+        copy = FiniteField.from_field(ff)
+        self.assertEqual(len(copy), 27)
+        self.assertTrue(all(copy.inv(a) == ff.inv(a) for a in nonzero))
+    
     def test_not_poly_field_simple(self):
         g = Poly([1, 0, 1], Symbol('X'))
         with self.assertRaises(ValueError):
             ff = FiniteField.modulo_poly(2, g)
+        with self.assertRaises(ValueError):
+            FiniteField.modulo_poly(3, Poly([1, 0, 1, 0, 1], Symbol('X')), packed=True)
+    
+    def test_extension(self):
+        ff = FiniteField.extension(3, 3, packed=True)
+        self.assertEqual(len(ff), 27)
+        self.assertTrue(ff.is_generator(3))  # X, packed in base 3
+        self.assertTrue(ff.check())
+    
+    def test_info_streamed(self):
+        ff = FiniteField.modulo_poly(2, Poly([1, 1, 1], Symbol('X')))
+        out = io.StringIO()
+        ff.info(file=out)
+        text = out.getvalue()
+        self.assertIn('Multiplication:', text)
+        self.assertIn(ff.table_binary(ff.mul), text)
+        self.assertIn('| inv |', ff.table_mono(ff.inv))
+        lines = ff.table_binary(ff.add).splitlines()
+        self.assertEqual(len(lines), 2 * 5 + 1)
+        self.assertEqual(len(set(map(len, lines))), 1)
+    
+    def test_export(self):
+        import tempfile
+        ff = FiniteField.modulo(5)
+        out = io.StringIO()
+        ff.export_table(out, 'add')
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0][0], 'add')
+        for row in rows[1:]:
+            a = int(row[0])
+            self.assertEqual([int(x) for x in row[1:]], [(a + int(b)) % 5 for b in rows[0][1:]])
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'mul.npy')
+            ff.export_table(path, 'mul')
+            self.assertTrue(np.array_equal(np.load(path), ff.tables['mul']))
+            ff.export_table(os.path.join(d, 'inv.csv'), 'inv')
+            with open(os.path.join(d, 'inv.csv')) as f:
+                header, values = csv.reader(f)
+            self.assertEqual(header[0], 'inv')
+            self.assertEqual([int(x) * int(y) % 5 for x, y in zip(header[2:], values[2:])], [1] * 4)
+    
+    def test_cached(self):
+        g = Poly([1, 0, 2, 2], Symbol('X'))
+        ff = FiniteField.cached(3, g, dense=True)
+        self.assertIs(FiniteField.cached(3, g, dense=True), ff)
+        self.assertIsNot(FiniteField.cached(3, g), ff)
+        self.assertIs(FiniteField.cached(7), FiniteField.cached(7))
+        self.assertIsNot(FiniteField.modulo(7), FiniteField.cached(7))
+        self.assertEqual(len(ff), 27)
 
+    
+    def test_batch_same_as_scalar(self):
+        for ff in [FiniteField.modulo(7),
+                   FiniteField.modulo_poly(2, Poly([1, 0, 0, 1, 1], Symbol('X')))]:
+            el = ff.elements
+            x, y = np.meshgrid(np.arange(len(ff)), np.arange(len(ff)))
+            self.assertEqual(ff.from_indices(ff.add_many_idx(x, y)),
+                             [ff.add(el[a], el[b]) for a, b in zip(x.flat, y.flat)])
+            self.assertEqual(ff.from_indices(ff.mul_many_idx(x, y)),
+                             [ff.mul(el[a], el[b]) for a, b in zip(x.flat, y.flat)])
+            self.assertEqual(ff.from_indices(ff.inv_many_idx(np.arange(1, len(ff)))),
+                             [ff.inv(a) for a in el[1:]])
+            self.assertEqual(ff.from_indices(ff.pow_many_idx(x, y)),
+                             [ff.pow(el[a], b) for a, b in zip(x.flat, y.flat)])
+            with self.assertRaises(KeyError):
+                ff.inv_many_idx(np.arange(len(ff)))
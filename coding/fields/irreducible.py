@@ -0,0 +1,186 @@
+
+from itertools import combinations, product
+
+from coding.util import euclides, factorize, Poly, Symbol
+from .prime import PrimeField
+from .dense import DensePoly, DensePolynomialField
+
+
+# Conway polynomials for small fields, as coefficients from low to high. These are
+# primitive, so X generates the multiplicative group of GF(p)[X]/(f).
+CONWAY = {
+    (2, 1): [1, 1],
+    (2, 2): [1, 1, 1],
+    (2, 3): [1, 1, 0, 1],
+    (2, 4): [1, 1, 0, 0, 1],
+    (2, 5): [1, 0, 1, 0, 0, 1],
+    (2, 6): [1, 1, 0, 1, 1, 0, 1],
+    (2, 7): [1, 1, 0, 0, 0, 0, 0, 1],
+    (2, 8): [1, 0, 1, 1, 1, 0, 0, 0, 1],
+    (2, 9): [1, 0, 0, 0, 1, 0, 0, 0, 0, 1],
+    (2, 10): [1, 1, 1, 1, 0, 1, 1, 0, 0, 0, 1],
+    (2, 11): [1, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    (2, 12): [1, 1, 0, 1, 0, 1, 1, 1, 0, 0, 0, 0, 1],
+    (2, 13): [1, 1, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    (2, 14): [1, 0, 0, 1, 0, 1, 0, 1, 0, 0, 0, 0, 0, 0, 1],
+    (2, 15): [1, 0, 1, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    (2, 16): [1, 0, 1, 1, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    (3, 1): [1, 1],
+    (3, 2): [2, 2, 1],
+    (3, 3): [1, 2, 0, 1],
+    (3, 4): [2, 0, 0, 2, 1],
+    (3, 5): [1, 2, 0, 0, 0, 1],
+    (3, 6): [2, 2, 1, 0, 2, 0, 1],
+    (5, 1): [3, 1],
+    (5, 2): [2, 4, 1],
+    (5, 3): [3, 3, 0, 1],
+    (5, 4): [2, 4, 4, 0, 1],
+    (7, 1): [4, 1],
+    (7, 2): [3, 6, 1],
+    (7, 3): [4, 0, 6, 1],
+    (11, 1): [9, 1],
+    (11, 2): [2, 7, 1],
+    (13, 1): [11, 1],
+    (13, 2): [2, 12, 1],
+}
+
+
+def _field(p):
+    return DensePolynomialField(Symbol('X'), PrimeField(p))
+
+def _convert(PF, f):
+    "f (a Poly or a DensePoly) as a monic DensePoly of PF"
+    if isinstance(f, Poly):
+        f = PF.convert(f)
+    f = PF._new([c % PF.F.p for c in f.coeffs])
+    lead = PF.F.inv(f.coeffs[-1])
+    return DensePoly([PF.F.mul(c, lead) for c in f.coeffs], PF.X)
+
+def _powmod(PF, h, e, f):
+    "h^e mod f"
+    res = PF.one
+    for b in bin(e)[2:]:
+        res = PF.mod(PF.mul(res, res), f)
+        if b == '1':
+            res = PF.mod(PF.mul(res, h), f)
+    return res
+
+
+def is_irreducible(f, p: int) -> bool:
+    """Rabin's test: f of degree n is irreducible over GF(p) if and only if
+    X^(p^n) = X (mod f), and gcd(X^(p^(n/r)) - X, f) = 1 for every prime r | n.
+    """
+
+    PF = _field(p)
+    f = _convert(PF, f)
+    n = f.degree()
+    if n < 1:
+        return False
+    X = DensePoly([0, 1], PF.X)
+    checks = {n // r for r in factorize(n)}
+
+    h = PF.mod(X, f)  # X^(p^k) mod f
+    for k in range(1, n + 1):
+        h = _powmod(PF, h, p, f)
+        if k in checks:
+            d, _, _ = euclides(f, PF.sub(h, X), PF)
+            if d.degree() > 0:
+                return False
+    return h == PF.mod(X, f)
+
+
+def is_primitive(f, p: int, factors=None) -> bool:
+    """Whether f is a primitive polynomial over GF(p), i.e. irreducible with X a
+    generator of the multiplicative group of GF(p)[X]/(f). `factors` are the prime
+    factors of p^deg(f) - 1, if they are known already.
+    """
+
+    PF = _field(p)
+    f = _convert(PF, f)
+    n = f.degree()
+    order = p**n - 1
+    # The norm of X, (-1)^n f(0), has to generate GF(p)*
+    norm = f.coeffs[0] if n % 2 == 0 else -f.coeffs[0] % p
+    if norm == 0 or any(pow(norm, (p - 1) // r, p) == 1 for r in factorize(p - 1)):
+        return False
+    if not is_irreducible(f, p):
+        return False
+    X = DensePoly([0, 1], PF.X)
+    if factors is None:
+        factors = factorize(order)
+    return all(_powmod(PF, X, order // r, f) != PF.one for r in factors)
+
+
+def _monic(p: int, n: int):
+    """All monic polynomials of degree n with nonzero constant term. They are
+    ordered by their largest coefficient, and then by weight, so a huge p still
+    gets to polynomials with more than two terms.
+    """
+    if n == 1:
+        yield [0, 1]
+    for m in range(1, p):
+        for w in range(n):
+            for middle in combinations(range(1, n), w):
+                for values in product(range(1, m + 1), repeat=w + 1):
+                    if max(values) < m:
+                        continue
+                    coeffs = [0] * n + [1]
+                    for i, v in zip((0,) + middle, values):
+                        coeffs[i] = v
+                    yield coeffs
+
+
+def _candidates(p: int, n: int, X):
+    table = CONWAY.get((p, n))
+    if table:
+        yield Poly(table[::-1], X)
+    for coeffs in _monic(p, n):
+        if coeffs != table:
+            yield Poly(coeffs[::-1], X)
+
+
+def find_irreducible(p: int, n: int, X=Symbol('X')):
+    """Generates the monic irreducible polynomials of degree n over GF(p), starting
+    with the Conway polynomial (if known), followed by those with few terms.
+    """
+    return (f for f in _candidates(p, n, X) if is_irreducible(f, p))
+
+
+def find_primitive(p: int, n: int, X=Symbol('X')):
+    "Like find_irreducible, but only primitive polynomials."
+    factors = factorize(p**n - 1)
+    return (f for f in _candidates(p, n, X) if is_primitive(f, p, factors))
+
+
+
+import unittest
+
+class IrreducibleTests(unittest.TestCase):
+    def setUp(self):
+        self.X = Symbol('X')
+
+    def test_irreducible(self):
+        self.assertTrue(is_irreducible(Poly([1, 0, 0, 1, 1], self.X), 2))
+        self.assertTrue(is_irreducible(Poly([1, 0, 2, 2], self.X), 3))
+        self.assertFalse(is_irreducible(Poly([1, 0, 1], self.X), 2))
+        self.assertFalse(is_irreducible(Poly([1, 1, 1, 1, 1, 1], self.X), 2))  # (x^2+x+1)(x^3+...)
+        self.assertFalse(is_irreducible(Poly([1, 0, 1, 0, 1], self.X), 3))
+
+    def test_count(self):
+        # Number of monic irreducible polynomials of degree 4 over GF(3) is (3^4 - 3^2)/4
+        self.assertEqual(len(list(find_irreducible(3, 4))), 18)
+
+    def test_primitive(self):
+        self.assertTrue(is_primitive(Poly([1, 0, 0, 1, 1], self.X), 2))
+        # x^4+x^3+x^2+x+1 is irreducible, but X has order 5
+        self.assertFalse(is_primitive(Poly([1, 1, 1, 1, 1], self.X), 2))
+
+    def test_conway_table(self):
+        for (p, n), coeffs in CONWAY.items():
+            self.assertTrue(is_primitive(Poly(coeffs[::-1], self.X), p), (p, n))
+
+    def test_find(self):
+        for p, n in [(2, 20), (3, 7), (1009, 3), (2**61 - 1, 2)]:
+            f = next(find_primitive(p, n))
+            self.assertEqual(f.degree(), n)
+            self.assertTrue(is_irreducible(f, p))
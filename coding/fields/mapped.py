@@ -0,0 +1,232 @@
+
+import json
+import mmap
+import os
+
+import numpy as np
+
+from coding.util import Poly, Symbol
+from .finite import FiniteField, index_dtype
+from .dense import DensePoly
+from .packed import PackedField
+from .zech import ZechField
+
+
+# File layout: MAGIC, the length of the JSON header (4 bytes, little endian), the
+# header, padding up to a multiple of ALIGN, and then the tables add, mul (q x q),
+# neg and inv (q) as raw arrays of index_dtype(q).
+MAGIC = b'GFTABLE1'
+ALIGN = 64
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'coding', 'fields')
+
+
+def _element_code(x, p: int) -> int:
+    "x as an int: itself, or its coefficients in base p (like PackedField)"
+    if isinstance(x, int):
+        return x
+    coeffs = x.coeffs if isinstance(x, DensePoly) else reversed(x.all_coeffs())
+    return sum(int(c) % p * p**i for i, c in enumerate(coeffs))
+
+
+def _monic_coeffs(p: int, modulus) -> list:
+    "Coefficients of the monic version of `modulus` over GF(p), from low to high"
+    coeffs = [int(c) % p for c in reversed(modulus.all_coeffs())]
+    lead = pow(coeffs[-1], -1, p)
+    return [c * lead % p for c in coeffs]
+
+
+def write_tables(path, ff: FiniteField, p: int, modulus=None, rows=None):
+    """Writes the dense tables of `ff` to `path`, in the order of the element codes
+    (see `_element_code`), so index i is the element with code i. The file is
+    written next to `path` first and then renamed, so readers never see half a file.
+    """
+
+    q = len(ff)
+    dtype = np.dtype(index_dtype(q))
+    codes = np.array([_element_code(x, p) for x in ff.elements], dtype=np.int64)
+    order = np.argsort(codes)  # order[c] = old index of the element with code c
+    if not np.array_equal(codes[order], np.arange(q)):
+        raise ValueError(f"The elements of {ff} can't be numbered 0 .. {q-1} by their code")
+    codes = codes.astype(dtype)
+    rows = rows or max(1, 2**22 // q)
+
+    header = json.dumps({
+        'p': p, 'q': q, 'dtype': dtype.str,
+        'modulus': None if modulus is None else _monic_coeffs(p, modulus),
+        'gen': None if modulus is None else str(modulus.gen),
+    }).encode()
+    start = len(MAGIC) + 4 + len(header)
+    padding = -start % ALIGN
+
+    tables = ff.tables
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + len(header).to_bytes(4, 'little') + header + b'\0' * padding)
+        for name in ['add', 'mul']:
+            for i in range(0, q, rows):  # a few rows at a time, to bound memory
+                block = tables[name][order[i:i+rows]][:, order]
+                f.write(codes[block].tobytes())
+        for name in ['neg', 'inv']:
+            f.write(codes[tables[name][order]].tobytes())
+    os.replace(tmp, path)
+
+
+class MappedField(FiniteField):
+    """A FiniteField whose tables are read-only NumPy views of a memory-mapped
+    file, written by `FiniteField.save`. Opening it doesn't depend on q, and all
+    processes that open the same file share one copy in the page cache.
+
+    The elements are the ints 0 .. q-1: the number itself for GF(p), and the
+    coefficients in base p for GF(p^n), just like with `packed=True`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a file with field tables")
+            length = int.from_bytes(f.read(4), 'little')
+            header = json.loads(f.read(length))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        q, dtype = header['q'], np.dtype(header['dtype'])
+        self.p = header['p']
+        offset = len(MAGIC) + 4 + length
+        offset += -offset % ALIGN
+        self.tables = {}
+        for name, shape in [('add', (q, q)), ('mul', (q, q)), ('neg', (q,)), ('inv', (q,))]:
+            count = int(np.prod(shape))
+            self.tables[name] = np.frombuffer(self._mmap, dtype, count, offset).reshape(shape)
+            offset += count * dtype.itemsize
+
+        self.numbers = self.elements = range(q)
+        self.zero, self.one = 0, 1
+        self.modulus = None
+        if header['modulus'] is not None:
+            self.modulus = Poly(header['modulus'][::-1], Symbol(header['gen']))
+            self.element_str = PackedField(self.p, self.modulus).element_str
+
+    def __reduce__(self):
+        # Other processes open the file again, instead of getting a copy
+        return MappedField, (self.path,)
+
+
+    # Operations ..........................................
+
+    def add(self, x, y):
+        return int(self.tables['add'][x, y])
+
+    def neg(self, x):
+        return int(self.tables['neg'][x])
+
+    def mul(self, x, y):
+        return int(self.tables['mul'][x, y])
+
+    def inv(self, x):
+        if x == self.zero:
+            raise KeyError(self.zero)  # like FiniteField
+        return int(self.tables['inv'][x])
+
+    def __iter__(self):
+        return iter(self.numbers)
+
+    def to_indices(self, xs):
+        return np.array(xs, dtype=index_dtype(len(self)))
+
+    def from_indices(self, idx):
+        return [int(i) for i in np.ravel(idx)]
+
+    def _dense_tables(self):
+        return self.tables
+
+
+def cache_path(p: int, modulus=None, directory=None) -> str:
+    "File for the tables of GF(p), or of GF(p)[X]/(modulus), in `directory`"
+    name = f'gf{p}'
+    if modulus is not None:
+        name += '_' + '_'.join(map(str, _monic_coeffs(p, modulus)))
+    return os.path.join(directory or CACHE_DIR, name + '.tables')
+
+
+def cached_field(p: int, modulus=None, directory=None) -> MappedField:
+    """GF(p), or GF(p^n) modulo the irreducible polynomial `modulus`, as a
+    MappedField. The tables are built (with a ZechField) and saved to `directory`
+    the first time; later calls, also from other processes, only open the file.
+    """
+
+    path = cache_path(p, modulus, directory)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if modulus is None:
+            ff = ZechField.modulo(p)
+        else:
+            ff = ZechField.modulo_poly(p, modulus, packed=True)
+        write_tables(path, ff, p, modulus)
+    return MappedField(path)
+
+
+
+import unittest
+import pickle
+import tempfile
+
+class MappedFieldTests(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.dir = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def assertSameField(self, mf, ff, code):
+        self.assertEqual(len(mf), len(ff))
+        for a in ff:
+            self.assertEqual(mf.neg(code(a)), code(ff.neg(a)))
+            if a != ff.zero:
+                self.assertEqual(mf.inv(code(a)), code(ff.inv(a)))
+            for b in ff:
+                self.assertEqual(mf.add(code(a), code(b)), code(ff.add(a, b)))
+                self.assertEqual(mf.mul(code(a), code(b)), code(ff.mul(a, b)))
+
+    def test_prime_field(self):
+        ff = FiniteField.modulo(13)
+        path = os.path.join(self.dir, 'gf13')
+        ff.save(path, 13)
+        mf = MappedField(path)
+        self.assertSameField(mf, ff, lambda x: x)
+        self.assertTrue(mf.check())
+
+    def test_poly_field(self):
+        g = Poly([1, 0, 2, 2], Symbol('X'))
+        ff = FiniteField.modulo_poly(3, g)
+        path = os.path.join(self.dir, 'gf27')
+        ff.save(path, 3, g)
+        mf = MappedField(path)
+        self.assertSameField(mf, ff, lambda x: _element_code(x, 3))
+        self.assertEqual(mf.element_str(3), 'X')
+        self.assertEqual(mf.order(3), 13)  # X isn't primitive here
+
+    def test_cached_field(self):
+        g = Poly([1, 0, 0, 0, 1, 1, 0, 1, 1], Symbol('X'))  # AES
+        mf = cached_field(2, g, self.dir)
+        mtime = os.path.getmtime(mf.path)
+        again = cached_field(2, g, self.dir)
+        self.assertEqual(os.path.getmtime(again.path), mtime)
+        self.assertFalse(again.tables['mul'].flags.writeable)
+        self.assertEqual(again.mul(0x53, 0xCA), 1)
+        self.assertEqual(again.inv(0x53), 0xCA)
+        self.assertSameField(mf, FiniteField.modulo_poly(2, g, packed=True), lambda x: x)
+
+    def test_pickle(self):
+        mf = cached_field(7, directory=self.dir)
+        copy = pickle.loads(pickle.dumps(mf))
+        self.assertEqual(copy.path, mf.path)
+        self.assertEqual(copy.mul(3, 5), 1)
+
+    def test_not_a_table_file(self):
+        path = os.path.join(self.dir, 'junk')
+        with open(path, 'wb') as f:
+            f.write(b'hello world')
+        with self.assertRaises(ValueError):
+            MappedField(path)
@@ -0,0 +1,250 @@
+
+from functools import lru_cache
+
+import numpy as np
+
+from coding.util import factorize
+
+# Polynomials in this module are lists of ints from low to high, reduced mod p.
+
+# (prime, primitive root): all primes k 2^23 + 1 < 2^31, largest first. Together
+# they can reconstruct coefficients of up to 568 bits.
+NTT_PRIMES = [(2130706433, 3), (2113929217, 5), (2088763393, 5), (2013265921, 31),
+              (1811939329, 13), (1711276033, 29), (1484783617, 5), (1300234241, 3),
+              (1224736769, 3), (1107296257, 10), (998244353, 3), (897581057, 3),
+              (880803841, 26), (754974721, 11), (645922817, 3), (595591169, 3),
+              (469762049, 3), (377487361, 7), (167772161, 3)]
+NTT_MAX_SIZE = 2**23
+
+
+@lru_cache(maxsize=16)
+def primitive_root(p: int) -> int:
+    "Smallest generator of the multiplicative group modulo the prime p"
+    factors = factorize(p - 1)
+    return next(g for g in range(2, p)
+                if all(pow(g, (p - 1) // r, p) != 1 for r in factors))
+
+
+def _powers(w: int, k: int, p: int):
+    "[1, w, w^2, ..., w^(k-1)] mod p"
+    res = np.ones(1, dtype=np.uint64)
+    while len(res) < k:
+        res = np.concatenate([res, res * np.uint64(pow(w, len(res), p)) % np.uint64(p)])
+    return res[:k]
+
+
+def _roots(p: int, root: int, n: int, inverse: bool):
+    """The powers of the (inverse) n-th root of unity modulo p, up to n/2. Every
+    (n/L)-th of them are those of the L-th root, for a butterfly of size L.
+    """
+    w = pow(root, (p - 1) // n, p)
+    if inverse:
+        w = pow(w, p - 2, p)
+    return _powers(w, n // 2, p)
+
+
+def _forward(a, p: int, root: int):
+    """Number theoretic transform of a (uint64, length a power of 2) modulo p < 2^31,
+    by decimation in frequency. The result is in bit reversed order, which is
+    all the same for pointwise products, and what `_inverse` expects.
+    """
+    n, P = len(a), np.uint64(p)
+    roots = _roots(p, root, n, False)
+    L = n
+    while L >= 2:
+        half = L // 2
+        a = a.reshape(-1, L)
+        u, v = a[:, :half], a[:, half:]
+        w = np.ascontiguousarray(roots[::n // L])  # powers of the L-th root
+        s = u + v
+        d = (u + P - v) * w % P
+        a = np.concatenate([np.minimum(s, s - P), d], axis=1).reshape(-1)  # s - P wraps if s < P
+        L //= 2
+    return a
+
+
+def _inverse(a, p: int, root: int):
+    "Inverse of `_forward`, by decimation in time, from bit reversed order"
+    n, P = len(a), np.uint64(p)
+    roots = _roots(p, root, n, True)
+    L = 2
+    while L <= n:
+        half = L // 2
+        a = a.reshape(-1, L)
+        w = np.ascontiguousarray(roots[::n // L])
+        u = a[:, :half]
+        v = a[:, half:] * w % P
+        s, d = u + v, u + P - v
+        a = np.concatenate([np.minimum(s, s - P), np.minimum(d, d - P)], axis=1).reshape(-1)
+        L *= 2
+    return a * np.uint64(pow(n, p - 2, p)) % P
+
+
+def _convolve(a, b, p: int, root: int, size: int):
+    "a * b modulo p, for a product of less than `size` coefficients. b can be a itself."
+    fa = _forward(np.pad(a, (0, size - len(a))), p, root)
+    fb = fa if b is a else _forward(np.pad(b, (0, size - len(b))), p, root)
+    return _inverse(fa * fb % np.uint64(p), p, root)
+
+
+def _garner(residues, moduli, p: int) -> list:
+    """Combines the convolutions modulo the primes `moduli` into one modulo p.
+    The exact coefficients x are written in mixed radix, x = y_0 + m_0 (y_1 +
+    m_1 (y_2 + ...)) with 0 <= y_i < m_i, and then reduced modulo p.
+    """
+    digits = []
+    for i, (r, m) in enumerate(zip(residues, moduli)):
+        M = np.uint64(m)
+        # x mod m, from the digits so far
+        x = np.zeros(len(r), dtype=np.uint64)
+        for y, m_j in zip(reversed(digits), reversed(moduli[:i])):
+            x = (x * np.uint64(m_j % m) + y) % M
+        prefix = 1
+        for m_j in moduli[:i]:
+            prefix = prefix * m_j % m
+        digits.append((r + M - x) % M * np.uint64(pow(prefix, -1, m)) % M)
+
+    if p < 2**31:
+        P = np.uint64(p)
+        res = np.zeros(len(residues[0]), dtype=np.uint64)
+        for y, m in zip(reversed(digits), reversed(moduli)):
+            res = (res * np.uint64(m % p) + y) % P
+        return res.tolist()
+
+    # x = sum y_i c_i (mod p), with c_i = m_0 ... m_(i-1) mod p. With the c_i split
+    # into 21 bit limbs, every product is below 2^52, so the sums of up to 19 of
+    # them fit in uint64. Only these sums are combined with Python ints.
+    limbs = [np.zeros(len(residues[0]), dtype=np.uint64) for _ in range(-(-p.bit_length() // 21))]
+    c = 1
+    for y, m in zip(digits, moduli):
+        for j, limb in enumerate(limbs):
+            limb += y * np.uint64(c >> (21 * j) & (2**21 - 1))
+        c = c * m % p
+    res = limbs[-1].astype(object)
+    for limb in reversed(limbs[:-1]):
+        res = (res << 21) + limb.astype(object)
+    return (res % p).tolist()
+
+
+def ntt_mul(a: list, b: list, p: int):
+    """Product of the polynomials a and b over GF(p), with number theoretic
+    transforms. If p has the necessary roots of unity, this is done modulo p
+    directly. Otherwise the exact product is reconstructed from NTTs modulo as
+    many of the NTT_PRIMES as needed (CRT, with Garner's algorithm). Returns None
+    if neither is possible, for p of more than about 270 bits.
+    """
+
+    n = len(a) + len(b) - 1
+    size = 1 << (n - 1).bit_length()
+    square = a is b  # one forward transform less
+    if p < 2**31 and (p - 1) % size == 0:
+        A = np.array(a, dtype=np.uint64)
+        B = A if square else np.array(b, dtype=np.uint64)
+        return _convolve(A, B, p, primitive_root(p), size)[:n].tolist()
+
+    # Enough primes for the exact coefficients, which are < min(len) (p-1)^2
+    largest = min(len(a), len(b)) * (p - 1)**2
+    primes, bound = [], 1
+    for q, g in NTT_PRIMES:
+        if bound > largest:
+            break
+        primes.append((q, g))
+        bound *= q
+    if size > NTT_MAX_SIZE or bound <= largest:
+        return None
+
+    dtype = np.uint64 if p < 2**63 else object
+    A = np.array(a, dtype=dtype)
+    B = A if square else np.array(b, dtype=dtype)
+    residues = []
+    for q, g in primes:
+        Q = np.uint64(q) if dtype is np.uint64 else q
+        RA = (A % Q).astype(np.uint64)
+        RB = RA if square else (B % Q).astype(np.uint64)
+        residues.append(_convolve(RA, RB, q, g, size)[:n])
+    return _garner(residues, [q for q, _ in primes], p)
+
+
+def _mul_mod(a: list, b: list, p: int, threshold=64):
+    if min(len(a), len(b)) >= threshold:
+        res = ntt_mul(a, b, p)
+        if res is not None:
+            return res
+    res = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                res[i + j] += x * y
+    return [c % p for c in res]
+
+
+def inverse_series(f: list, k: int, p: int) -> list:
+    "g with f g = 1 (mod X^k), by Newton iteration. f[0] should be invertible."
+    g = [pow(f[0], -1, p)]
+    l = 1
+    while l < k:
+        l = min(2 * l, k)
+        # g <- g (2 - f g)
+        e = [-c % p for c in _mul_mod(f[:l], g, p)[:l]]
+        e[0] = (e[0] + 2) % p
+        g = _mul_mod(g, e, p)[:l]
+    return g + [0] * (k - len(g))
+
+
+def ntt_divmod(a: list, b: list, p: int):
+    """Quotient and remainder of a by b over GF(p), via the inverse of reversed b
+    as a power series. Both are returned as lists, possibly with trailing zeros.
+    b should not have trailing zeros.
+    """
+
+    n, m = len(a) - 1, len(b) - 1
+    if n < m:
+        return [], a[:]
+    k = n - m + 1
+    g = inverse_series(b[::-1], k, p)
+    q = _mul_mod(a[::-1][:k], g, p)[:k]
+    q = (q + [0] * (k - len(q)))[::-1]
+    bq = _mul_mod(b, q, p)
+    return q, [(a[i] - bq[i]) % p for i in range(m)]
+
+
+
+import unittest
+import random
+
+class NttTests(unittest.TestCase):
+    def naive_mul(self, a, b, p):
+        return _mul_mod(a, b, p, threshold=float('inf'))
+
+    def test_mul(self):
+        random.seed(2)
+        for p in [998244353, 7, 10007, 2**31 - 1, 2**35 - 31]:
+            for n, m in [(1, 1), (64, 64), (200, 90), (513, 700)]:
+                a = [random.randrange(p) for _ in range(n)]
+                b = [random.randrange(p) for _ in range(m)]
+                self.assertEqual(ntt_mul(a, b, p), self.naive_mul(a, b, p), (p, n, m))
+
+    def test_large_primes(self):
+        random.seed(4)
+        for p in [2**61 - 1, 2**127 - 1, 2**255 - 19]:
+            for n, m in [(64, 64), (300, 1000)]:
+                a = [random.randrange(p) for _ in range(n)]
+                b = [random.randrange(p) for _ in range(m)]
+                self.assertEqual(ntt_mul(a, b, p), self.naive_mul(a, b, p), (p, n, m))
+
+    def test_huge_prime(self):
+        self.assertIsNone(ntt_mul([1] * 100, [1] * 100, 2**521 - 1))
+
+    def test_divmod(self):
+        random.seed(3)
+        for p in [998244353, 10007]:
+            for n, m in [(10, 20), (300, 100), (1000, 900)]:
+                a = [random.randrange(p) for _ in range(n)]
+                b = [random.randrange(p) for _ in range(m - 1)] + [random.randrange(1, p)]
+                q, r = ntt_divmod(a, b, p)
+                # a = b q + r, with deg r < deg b
+                bq = self.naive_mul(b, q, p) if q else []
+                lhs = [(x + y) % p for x, y in zip(bq + [0] * n, r + [0] * (len(bq) + n))]
+                self.assertEqual(lhs[:n], a)
+                self.assertTrue(all(c == 0 for c in lhs[n:]))
+                self.assertEqual(len(r), m - 1 if n >= m else n)
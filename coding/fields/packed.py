@@ -0,0 +1,197 @@
+
+from coding.util import Poly, Symbol, degree
+from .base import Field
+
+
+class PackedField(Field):
+    """GF(p^n) with its elements packed in integers.
+
+    The polynomial `c_(n-1) X^(n-1) + ... + c_1 X + c_0` is represented by the int
+    `c_(n-1) p^(n-1) + ... + c_1 p + c_0`, so hashing and comparing elements is as
+    cheap as it gets. Arithmetic is computed on demand, modulo `modulus`, which
+    should be an irreducible polynomial over GF(p) of degree n. Use `to_poly` and
+    `from_poly` to convert between both representations.
+    """
+
+    zero = 0
+    one = 1
+
+    def __init__(self, p: int, modulus):
+        coeffs = [int(c) % p for c in modulus.all_coeffs()]
+        if coeffs[0] == 0:
+            raise ValueError(f"Leading coefficient of {modulus} is divisible by {p}")
+        # Make the modulus monic, this doesn't change the field
+        lead_inv = pow(coeffs[0], -1, p)
+        self.p = p
+        self.n = int(degree(modulus))
+        self.X = modulus.gen
+        self._modulus = [c * lead_inv % p for c in reversed(coeffs)]  # low to high
+        self.q = p ** self.n
+
+    # Packing .............................................
+
+    def digits(self, x: int) -> list:
+        "Coefficients of `x`, from low to high"
+        d = []
+        for _ in range(self.n):
+            x, r = divmod(x, self.p)
+            d.append(r)
+        return d
+
+    def pack(self, digits) -> int:
+        x = 0
+        for d in reversed(digits):
+            x = x * self.p + d
+        return x
+
+    def to_poly(self, x: int) -> Poly:
+        return Poly(list(reversed(self.digits(x))), self.X)
+
+    def from_poly(self, f: Poly) -> int:
+        coeffs = [int(c) % self.p for c in reversed(f.all_coeffs())]
+        return self.pack(self._reduce(coeffs))
+
+    def element_str(self, x):
+        return str(self.to_poly(x))
+
+
+    # Operations ..........................................
+
+    def add(self, x, y):
+        p = self.p
+        return self.pack([(a + b) % p for a, b in zip(self.digits(x), self.digits(y))])
+
+    def neg(self, x):
+        p = self.p
+        return self.pack([-a % p for a in self.digits(x)])
+
+    def mul(self, x, y):
+        a, b = self.digits(x), self.digits(y)
+        prod = [0] * (2 * self.n - 1)
+        for i, u in enumerate(a):
+            if u:
+                for j, v in enumerate(b):
+                    prod[i + j] += u * v
+        return self.pack(self._reduce(prod))
+
+    def _reduce(self, coeffs):
+        "Reduces a list of coefficients (low to high) modulo the (monic) modulus."
+        p, n, m = self.p, self.n, self._modulus
+        coeffs = coeffs + [0] * (n - len(coeffs))
+        for i in range(len(coeffs) - 1, n - 1, -1):
+            c = coeffs[i] % p
+            if c:
+                for j in range(n):
+                    coeffs[i - n + j] -= c * m[j]
+        return [c % p for c in coeffs[:n]]
+
+    def inv(self, x):
+        if x == self.zero:
+            raise ZeroDivisionError(f"0 has no inverse in {self}")
+        return self.pow(x, self.q - 2)
+
+    def from_int(self, i: int):
+        return i % self.p
+
+
+    # Iteration ...........................................
+
+    def __iter__(self):
+        return iter(range(self.q))
+
+    def __contains__(self, x):
+        return isinstance(x, int) and 0 <= x < self.q
+
+    def __len__(self):
+        return self.q
+
+    __str__ = __repr__ = lambda s: f'GF({s.p}^{s.n})'
+
+
+class BinaryField(PackedField):
+    """GF(2^n), bit-packed: addition is XOR, multiplication is carry-less
+    (shift and XOR) and reduced by the modulus along the way.
+    """
+
+    def __init__(self, modulus):
+        super().__init__(2, modulus)
+        self._top = 1 << self.n
+        self._mask = self.pack(self._modulus) | self._top
+
+    def add(self, x, y):
+        return x ^ y
+
+    sub = add
+
+    def neg(self, x):
+        return x
+
+    def mul(self, x, y):
+        res = 0
+        top, mask = self._top, self._mask
+        while y:
+            if y & 1:
+                res ^= x
+            y >>= 1
+            x <<= 1
+            if x & top:
+                x ^= mask
+        return res
+
+    def digits(self, x: int) -> list:
+        return [(x >> i) & 1 for i in range(self.n)]
+
+    def from_int(self, i: int):
+        return i & 1
+
+
+
+import unittest
+
+class PackedFieldTests(unittest.TestCase):
+    def setUp(self):
+        self.X = Symbol('X')
+
+    def test_poly_conversion(self):
+        F = PackedField(3, Poly([1, 0, 2, 2], self.X))
+        for x in F:
+            self.assertEqual(F.from_poly(F.to_poly(x)), x)
+        self.assertEqual(F.to_poly(5), Poly([1, 2], self.X))
+        self.assertIs(type(F.from_poly(Poly([1, 2], self.X))), int)
+        B = BinaryField(Poly([1, 0, 0, 1, 1], self.X))
+        self.assertIs(type(B.from_poly(Poly([1, 1, 0, 1], self.X))), int)
+
+    def test_same_as_polynomials(self):
+        from .finite import FiniteField
+        g = Poly([1, 0, 2, 2], self.X)
+        ff = FiniteField.modulo_poly(3, g)
+        F = PackedField(3, g)
+        for a in ff:
+            for b in ff:
+                self.assertEqual(F.to_poly(F.mul(F.from_poly(a), F.from_poly(b))), ff.mul(a, b))
+                self.assertEqual(F.to_poly(F.add(F.from_poly(a), F.from_poly(b))), ff.add(a, b))
+
+    def test_binary_aes(self):
+        # Multiplication in Rijndael's field, see FIPS-197 section 4.2
+        F = BinaryField(Poly([1, 0, 0, 0, 1, 1, 0, 1, 1], self.X))
+        self.assertEqual(F.mul(0x57, 0x83), 0xc1)
+        self.assertEqual(F.mul(0x57, 0x13), 0xfe)
+        self.assertEqual(F.inv(0x53), 0xca)
+        self.assertEqual(F.add(0x57, 0x83), 0xd4)
+
+    def test_binary_same_as_packed(self):
+        g = Poly([1, 0, 0, 1, 1], self.X)
+        B, P = BinaryField(g), PackedField(2, g)
+        for a in B:
+            for b in B:
+                self.assertEqual(B.mul(a, b), P.mul(a, b))
+                self.assertEqual(B.add(a, b), P.add(a, b))
+
+    def test_finite_field(self):
+        from .finite import FiniteField
+        ff = FiniteField.modulo_poly(2, Poly([1, 0, 0, 1, 1], self.X), packed=True)
+        self.assertEqual(len(ff), 16)
+        self.assertTrue(ff.check())
+        self.assertIn('X**3 + 1', ff.table_mono(ff.inv))
+        with self.assertRaises(ValueError):
+            FiniteField.modulo_poly(2, Poly([1, 0, 1], self.X), packed=True)
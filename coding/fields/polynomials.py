@@ -1,13 +1,19 @@
 
 from itertools import product
 
-from coding.util import defzip, Symbol, Poly, degree
+from coding.util import defzip, Symbol, Poly, degree, instance_memoize
 from .base import Field, Integers
+from .prime import PrimeField
+from .ntt import ntt_mul, ntt_divmod
 
 
 class PolynomialField(Field):
     key = staticmethod(lambda p: degree(p)+1)
     
+    # From this many coefficients on, products and divisions over a PrimeField use
+    # number theoretic transforms (see `ntt_mul` and `ntt_divmod`)
+    ntt_threshold = 16
+    
     def __init__(self, X, F=Integers):
         self.X = X
         self.F = F
@@ -27,7 +33,21 @@ class PolynomialField(Field):
     def neg(self, f):
         return Poly((self.F.neg(x) for x in f.all_coeffs()), self.X)
     
+    def _use_ntt(self, size: int) -> bool:
+        return isinstance(self.F, PrimeField) and size >= self.ntt_threshold
+    
+    def _reduced(self, coeffs):
+        "Coefficients from high to low, as a list from low to high reduced modulo p"
+        p = self.F.p
+        return [int(c) % p for c in reversed(coeffs)]
+    
     def mul(self, f, g):
+        a, b = f.all_coeffs(), g.all_coeffs()
+        if self._use_ntt(min(len(a), len(b))):
+            a = self._reduced(a)
+            res = ntt_mul(a, a if f is g else self._reduced(b), self.F.p)
+            if res is not None:
+                return Poly(res[::-1], self.X)
         f_coeff, g_coeff = self.pad_coeff(f, g)
         total_coeff = {}
         for i, x in enumerate(reversed(f_coeff)):
@@ -38,6 +58,10 @@ class PolynomialField(Field):
     def divmod(self, f, g):
         num = f.all_coeffs()
         div = g.all_coeffs()
+        m = len(div) - 1
+        if self._use_ntt(min(m, len(num) - 1 - m)) and int(div[0]) % self.F.p:
+            quot, rem = ntt_divmod(self._reduced(num), self._reduced(div), self.F.p)
+            return Poly(quot[::-1] or [0], self.X), Poly(rem[::-1] or [0], self.X)
         
         quot = []
         divisor = div[0]
@@ -56,7 +80,8 @@ class PolynomialField(Field):
         return self.divmod(f, g)[0]
     
     def mod(self, f, g):
-        return self.divmod(f, g)[1]
+        "Remainder of f divided by g. Reductions are cached, see `_mod`."
+        return _mod(self, f, g)
     
     def inv(self, f):
         # If this is true:
@@ -81,6 +106,14 @@ class PolynomialField(Field):
 
 
 
+@instance_memoize('PF', maxsize=4096)
+def _mod(PF, f, g):
+    # Building a FiniteField reduces a+b and b+a, a*b and b*a, ... separately.
+    # Use _mod.cache_clear(PF) after changing the operations of PF or its F.
+    return PF.divmod(f, g)[1]
+
+
+
 import unittest
 
 class IntPolyTests(unittest.TestCase):
@@ -100,6 +133,17 @@ class IntPolyTests(unittest.TestCase):
         g = Poly([1, 2, 3, 4], self.X)
         self.assertEqual(self.PF.mod(f, g), f)
     
+    def test_mod_cached(self):
+        f = Poly([3, 2, -2, 2], self.X)
+        g = Poly([1, 0, 4], self.X)
+        hits = _mod.cache_info(self.PF).hits
+        self.assertEqual(self.PF.mod(f, g), Poly([-14, -6], self.X))
+        self.assertEqual(self.PF.mod(f, g), Poly([-14, -6], self.X))
+        self.assertEqual(_mod.cache_info(self.PF).hits, hits + 1)
+        self.assertEqual(_mod.cache_info(PolynomialField(self.X)).size, 0)
+        _mod.cache_clear(self.PF)
+        self.assertEqual(_mod.cache_info(self.PF).size, 0)
+    
     def test_undivisable(self):
         f = Poly([10, 0, -4, 2, -2, 2], self.X)
         g = Poly([2, 0, 1, 4], self.X)
@@ -107,6 +151,25 @@ class IntPolyTests(unittest.TestCase):
             self.PF.divmod(f, g)
 
 
+class PrimePolyTests(unittest.TestCase):
+    def test_ntt(self):
+        import random
+        from .prime import PrimeField
+        rnd = random.Random(7)
+        X = Symbol('X')
+        for p in [7, 10007, 2**61 - 1]:
+            PF = PolynomialField(X, PrimeField(p))
+            plain = PolynomialField(X, PrimeField(p))
+            plain.ntt_threshold = float('inf')
+            for n, m in [(20, 16), (100, 40), (40, 40)]:
+                f = Poly([rnd.randrange(1, p)] + [rnd.randrange(p) for _ in range(n)], X)
+                g = Poly([rnd.randrange(1, p)] + [rnd.randrange(p) for _ in range(m)], X)
+                self.assertEqual(PF.mul(f, g), plain.mul(f, g), (p, n, m))
+                self.assertEqual(PF.mul(f, f), plain.mul(f, f), (p, n, m))
+                self.assertEqual(PF.divmod(PF.mul(f, g), g), (f, PF.zero))
+                self.assertEqual(PF.divmod(f, g), plain.divmod(f, g), (p, n, m))
+
+
 class RealPolyTests(unittest.TestCase):
     def setUp(self):
         from coding.fields.base import Reals
@@ -0,0 +1,100 @@
+
+from coding.util import Poly, Symbol, instance_memoize
+from .base import Integers
+
+
+class FixedBase:
+    """Calculates g^n (mod p) in F for many exponents n, with the same g.
+
+    A table of g^(d * 2^(w*j)) is kept for all w-bit digits d. After that, g^n
+    takes one multiplication per nonzero w-bit digit of n, and no squarings. The
+    table grows as larger exponents are asked for. With `p` None, nothing is
+    reduced, e.g. for FiniteFields.
+    """
+
+    def __init__(self, g, p=None, F=Integers, window=4):
+        self.p = p
+        self.F = F
+        self.window = window
+        self.g = self._reduce(g)
+        self.one = self._reduce(F.one)
+        self._table = []  # _table[j][d] = g^(d * 2^(w*j))
+        self._next = self.g  # g^(2^(w*len(_table)))
+
+    def _reduce(self, x):
+        return x if self.p is None else self.F.mod(x, self.p)
+
+    def _mul(self, x, y):
+        return self._reduce(self.F.mul(x, y))
+
+    def _extend(self, bits: int):
+        while len(self._table) * self.window < bits:
+            row = [self.one, self._next]
+            for d in range(2, 2**self.window):
+                row.append(self._mul(row[-1], self._next))
+            self._next = self._mul(row[-1], self._next)
+            self._table.append(row)
+
+    def __call__(self, n: int):
+        assert n >= 0, "negative powers aren't supported"
+        self._extend(n.bit_length())
+        mask = 2**self.window - 1
+        res = self.one
+        for row in self._table:
+            if not n:
+                break
+            if n & mask:
+                res = self._mul(res, row[n & mask])
+            n >>= self.window
+        return res
+
+
+CACHE_SIZE = 64  # FixedBases per field
+
+@instance_memoize('F', maxsize=CACHE_SIZE)
+def fixed_base(g, p=None, F=Integers, window=4) -> FixedBase:
+    """Cached FixedBase for (g, p, F), see FixedBase. Every field keeps the
+    CACHE_SIZE most recently used ones. Use `fixed_base.cache_clear(F)` after
+    changing the operations of F, or `fixed_base.cache_clear()` for all fields.
+    """
+    return FixedBase(g, p, F, window)
+
+
+
+import unittest
+import weakref
+
+class FixedBaseTests(unittest.TestCase):
+    def test_integers(self):
+        pw = FixedBase(3, 1000003)
+        for n in [0, 1, 2, 15, 16, 17, 12345, 2**70 + 5]:
+            self.assertEqual(pw(n), pow(3, n, 1000003))
+
+    def test_polynomials(self):
+        from .finite import FiniteField
+        from .polynomials import PolynomialField
+        X = Symbol('X')
+        PF = PolynomialField(X, FiniteField.modulo(2))
+        f = Poly([1, 0, 0, 1, 1], X)
+        pw = FixedBase(Poly([1, 0], X), f, PF)
+        self.assertEqual(pw(15), PF.one)
+        self.assertEqual(pw(5), Poly([1, 1, 0], X))
+
+    def test_finite_field(self):
+        from .finite import FiniteField
+        ff = FiniteField.modulo(11)
+        pw = fixed_base(2, None, ff)
+        self.assertIs(fixed_base(2, None, ff), pw)
+        self.assertEqual([pw(i) for i in range(11)], [pow(2, i, 11) for i in range(11)])
+        fixed_base.cache_clear(ff)
+        self.assertIsNot(fixed_base(2, None, ff), pw)
+
+    def test_cache_per_field(self):
+        import gc
+        from .finite import FiniteField
+        ff = FiniteField.modulo(13)
+        ff.mul_generators()
+        ref = weakref.ref(ff)
+        del ff
+        gc.collect()
+        self.assertIsNone(ref())
@@ -0,0 +1,212 @@
+
+from coding.util import euclides, is_prime
+from .base import Field
+
+
+class PrimeField(Field):
+    """GF(p), the integers modulo a prime `p`, without any tables.
+
+    Elements are the Python ints `0, ..., p-1`, and every operation is computed on
+    demand, so `p` can be as large as you like (e.g. a 2048-bit prime).
+
+    `add`, `neg`, `mul`, `inv`, `div` and `pow` are the field operations. `mod`
+    and `divmod` however work on the integer representatives, just like they do in
+    `Integers`. This way a PrimeField can stand in for `Integers` in code that
+    reduces by `p` itself, such as `powermod`, `euclides` and the DLP solvers.
+
+    `reduction` can be set to 'barrett' to use Barrett reduction in `mul`. See
+    `Montgomery` for hot loops that can stay in Montgomery form.
+
+    The number of elements is `q` (= p). There is no `len`, which can't return
+    more than sys.maxsize.
+    """
+
+    zero = 0
+    one = 1
+
+    def __init__(self, p: int, reduction=None, check=True):
+        if check and not is_prime(p):
+            raise ValueError(f"{p} isn't prime")
+        self.p = p
+        self.q = p
+        self.reduction = reduction
+        if reduction == 'barrett':
+            self._barrett = Barrett(p)
+            self.mul = self._mul_barrett
+        elif reduction is not None:
+            raise ValueError(f"Unknown reduction {reduction!r}")
+
+    def __reduce__(self):
+        return (type(self), (self.p, self.reduction, False))
+
+
+    # Operations ..........................................
+
+    def add(self, x, y):
+        return (x + y) % self.p
+
+    def sub(self, x, y):
+        return (x - y) % self.p
+
+    def neg(self, x):
+        return -x % self.p
+
+    def mul(self, x, y):
+        return x * y % self.p
+
+    def _mul_barrett(self, x, y):
+        return self._barrett.reduce(x * y)
+
+    def inv(self, x):
+        x %= self.p
+        if x == 0:
+            raise ZeroDivisionError(f"0 has no inverse in {self}")
+        return pow(x, -1, self.p)
+
+    def div(self, x, y):
+        return self.mul(x, self.inv(y))
+
+    def pow(self, x, n: int, window=None):
+        return pow(x, n, self.p)
+
+    def mod(self, x, y):
+        return x % y
+
+    def divmod(self, x, y):
+        return divmod(x, y)
+
+    def from_int(self, i: int):
+        return i % self.p
+
+
+    # Iteration ...........................................
+
+    def all_mod(self, x):
+        return set(range(x))
+
+    def __iter__(self):
+        return iter(range(self.p))
+
+    def __contains__(self, x):
+        # Every integer is a representative of an element
+        return isinstance(x, int)
+
+    __str__ = __repr__ = lambda s: f'GF({s.p})'
+
+
+class Barrett:
+    """Barrett reduction modulo `p`, for products of two reduced numbers."""
+
+    def __init__(self, p: int):
+        self.p = p
+        self.k = 2 * p.bit_length()
+        self.mu = (1 << self.k) // p
+
+    def reduce(self, x: int) -> int:
+        "Calculates x mod p, for 0 <= x < p²"
+        r = x - ((x * self.mu) >> self.k) * self.p
+        while r >= self.p:
+            r -= self.p
+        return r
+
+
+class Montgomery:
+    """Montgomery arithmetic modulo an odd `p`. Numbers are converted to Montgomery
+    form with `enter`, multiplied with `mul` and `pow` without any division, and
+    converted back with `leave`.
+    """
+
+    def __init__(self, p: int):
+        assert p % 2 == 1, "Montgomery reduction needs an odd modulus"
+        self.p = p
+        self.bits = p.bit_length()
+        self.mask = (1 << self.bits) - 1
+        # p * p_inv = -1 (mod R), with R = 2^bits
+        _, _, t = euclides(1 << self.bits, p)
+        self.p_inv = -t % (1 << self.bits)
+        self.one = self.enter(1)
+
+    def enter(self, x: int) -> int:
+        return (x << self.bits) % self.p
+
+    def leave(self, x: int) -> int:
+        return self.redc(x)
+
+    def redc(self, x: int) -> int:
+        "Calculates x/R mod p, for 0 <= x < pR"
+        m = ((x & self.mask) * self.p_inv) & self.mask
+        t = (x + m * self.p) >> self.bits
+        return t - self.p if t >= self.p else t
+
+    def mul(self, x: int, y: int) -> int:
+        return self.redc(x * y)
+
+    def pow(self, x: int, n: int) -> int:
+        res = self.one
+        for b in bin(n)[2:]:
+            res = self.redc(res * res)
+            if b == '1':
+                res = self.redc(res * x)
+        return res
+
+
+
+import unittest
+
+class PrimeFieldTests(unittest.TestCase):
+    p = 2**127 - 1
+
+    def test_not_prime(self):
+        for p in [1, 4, 561, 2**64 + 1]:
+            with self.assertRaises(ValueError):
+                PrimeField(p)
+
+    def test_small_field(self):
+        F = PrimeField(11)
+        for a in F:
+            for b in F:
+                self.assertEqual(F.add(a, b), (a + b) % 11)
+                self.assertEqual(F.mul(a, b), (a * b) % 11)
+            if a:
+                self.assertEqual(F.mul(a, F.inv(a)), 1)
+        with self.assertRaises(ZeroDivisionError):
+            F.inv(0)
+
+    def test_large_field(self):
+        F = PrimeField(self.p)
+        x = 3**100
+        self.assertEqual(F.mul(x, F.inv(x)), F.one)
+        self.assertEqual(F.pow(x, self.p - 1), F.one)
+        self.assertEqual(F.q, self.p)
+        with self.assertRaises(TypeError):
+            len(F)  # not OverflowError, or a silently wrong size
+
+    def test_euclides(self):
+        F = PrimeField(self.p)
+        d, s, t = euclides(12345, self.p, F)
+        self.assertEqual(d, F.one)
+        self.assertEqual(t, F.inv(12345))
+        self.assertEqual(euclides(12345, self.p, F), (d, s, t))  # from the cache
+        from coding.util import algos
+        self.assertEqual(algos._euclides_cached.cache_info(F).hits, 1)  # not another field's
+        euclides.cache_clear(F)
+        self.assertEqual(algos._euclides_cached.cache_info(F).size, 0)
+
+    def test_inv_many(self):
+        F = PrimeField(self.p)
+        xs = [1, 2, 12345, self.p - 1, 3**100]
+        self.assertEqual(F.inv_many(xs), [F.inv(x) for x in xs])
+        self.assertEqual(F.inv_many([]), [])
+        with self.assertRaises(ZeroDivisionError):
+            F.inv_many([3, 0, 5])
+
+    def test_barrett(self):
+        F = PrimeField(self.p, reduction='barrett')
+        for x, y in [(0, 5), (self.p - 1, self.p - 1), (3**80, 7**45)]:
+            self.assertEqual(F.mul(x, y), x * y % self.p)
+
+    def test_montgomery(self):
+        M = Montgomery(self.p)
+        x, y = 3**80, 7**45
+        self.assertEqual(M.leave(M.mul(M.enter(x), M.enter(y))), x * y % self.p)
+        self.assertEqual(M.leave(M.pow(M.enter(x), 12345)), pow(x, 12345, self.p))
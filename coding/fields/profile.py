@@ -0,0 +1,207 @@
+
+from contextlib import contextmanager
+from time import perf_counter
+
+from coding.util import as_rest_table
+
+
+OPS = ('add', 'neg', 'mul', 'inv', 'divmod', 'pow')
+
+
+class OpStats:
+    "Calls of one operation, and the time spent in the ones that were timed"
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.timed = 0
+        self.time = 0.0  # seconds, in the timed calls
+
+    @property
+    def total_time(self):
+        "Estimated time in all calls, extrapolated from the timed ones"
+        return self.time * self.calls / self.timed if self.timed else 0.0
+
+    @property
+    def per_call(self):
+        return self.time / self.timed if self.timed else 0.0
+
+    __str__ = __repr__ = lambda s: f'OpStats({s.name}: {s.calls} calls, {s.total_time:.3g} s)'
+
+
+class Profile:
+    """Statistics of the operations of a field F, by name: `profile['mul'].calls`.
+    Times are inclusive, so the time of `pow` contains that of its `mul`s.
+    """
+
+    def __init__(self, F, ops, sample):
+        self.F = F
+        self.sample = sample
+        self.ops = {name: OpStats(name) for name in ops}
+
+    def __getitem__(self, name) -> OpStats:
+        return self.ops[name]
+
+    def __iter__(self):
+        return iter(self.ops.values())
+
+    @property
+    def calls(self):
+        return sum(op.calls for op in self)
+
+    def table(self):
+        data = [['op', 'calls', 'time (s)', 'per call (us)']]
+        for op in sorted(self, key=lambda op: op.total_time, reverse=True):
+            data.append([op.name, op.calls, f'{op.total_time:.4f}', f'{op.per_call * 1e6:.2f}'])
+        return as_rest_table(data)
+
+    __str__ = lambda s: f'Operations of {s.F}:\n\n{s.table()}'
+    __repr__ = lambda s: f'Profile({s.F}, {s.calls} calls)'
+
+
+def _timed(f, op):
+    def wrapper(*args, **kwargs):
+        op.calls += 1
+        op.timed += 1
+        start = perf_counter()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            op.time += perf_counter() - start
+    return wrapper
+
+def _sampled(f, op, every):
+    def wrapper(*args, **kwargs):
+        op.calls += 1
+        if op.calls % every:
+            return f(*args, **kwargs)
+        op.timed += 1
+        start = perf_counter()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            op.time += perf_counter() - start
+    return wrapper
+
+
+def _caches():
+    "The memoized functions whose cache would hide field operations, as (module, name)"
+    from coding.util import algos  # avoid circular imports
+    from . import polynomials
+    return [(algos, '_euclides_cached'), (polynomials, '_mod')]
+
+
+@contextmanager
+def ops_profile(F, ops=OPS, sample=None):
+    """Counts and times the operations `ops` of the field instance F in the block:
+
+        with ops_profile(F) as stats:
+            euclides(a, b, F)
+        print(stats)
+
+    With `sample=n`, all calls are counted but only every n-th one is timed, and
+    the total time is extrapolated from those. Timing is the main overhead.
+
+    The methods are replaced by counting ones on the instance, and removed again
+    afterwards, so there is no cost at all outside the block. Only calls that
+    look up the method on F in the block are seen, not those through a bound
+    method that was taken before. F can't be pickled in the block.
+    
+    The caches of `euclides` and `PolynomialField.mod` are bypassed in the block,
+    by calling the undecorated functions, so cached results don't hide the
+    operations they need.
+    """
+
+    ops = [name for name in ops if hasattr(F, name)]
+    stats = Profile(F, ops, sample)
+    previous = {name: F.__dict__[name] for name in ops if name in F.__dict__}
+    for name in ops:
+        f = getattr(F, name)
+        F.__dict__[name] = _timed(f, stats[name]) if not sample or sample == 1 else \
+            _sampled(f, stats[name], sample)
+    caches = [(module, name, getattr(module, name)) for module, name in _caches()]
+    for module, name, cached in caches:
+        setattr(module, name, getattr(cached, '__wrapped__', cached))
+    try:
+        yield stats
+    finally:
+        for module, name, cached in caches:
+            setattr(module, name, cached)
+        for name in ops:
+            if name in previous:
+                F.__dict__[name] = previous[name]
+            else:
+                del F.__dict__[name]
+
+
+
+import unittest
+
+class ProfileTests(unittest.TestCase):
+    def test_counts(self):
+        from coding.util import euclides, Symbol
+        from .prime import PrimeField
+        from .dense import DensePolynomialField
+        F = PrimeField(10007)
+        PF = DensePolynomialField(Symbol('X'), F)
+        f, g = PF._new([3, 1, 4, 1, 5, 9, 2]), PF._new([2, 7, 1, 8, 2, 8])
+        with ops_profile(PF) as outer, ops_profile(F) as inner:
+            d, s, t = euclides(f, g, PF)
+        self.assertEqual(PF.add(PF.mul(s, f), PF.mul(t, g)), d)
+        self.assertNotIn('mul', F.__dict__)
+        self.assertNotIn('divmod', PF.__dict__)
+        self.assertGreater(outer['divmod'].calls, 0)
+        self.assertGreater(inner['mul'].calls, 0)
+        self.assertGreater(inner['mul'].total_time, 0)
+
+    def test_not_cached(self):
+        from coding.util import euclides, Symbol, Poly
+        from .prime import PrimeField
+        from .polynomials import PolynomialField
+        PF = PolynomialField(Symbol('X'), PrimeField(101))
+        f, g = Poly([3, 1, 4, 1, 5, 9], PF.X), Poly([2, 7, 1, 8], PF.X)
+        counts = []
+        for _ in range(2):
+            with ops_profile(PF) as stats:
+                euclides(f, g, PF)
+                PF.mod(f, g)
+            counts.append(stats['divmod'].calls)
+        self.assertEqual(counts[0], counts[1])
+        self.assertGreater(counts[0], 1)
+        from coding.util import algos
+        from . import polynomials
+        self.assertTrue(hasattr(algos._euclides_cached, 'cache_info'))
+        self.assertTrue(hasattr(polynomials._mod, 'cache_info'))
+    
+    def test_pow(self):
+        from coding.util import Poly, Symbol
+        from .base import square_and_multiply
+        from .packed import BinaryField
+        F = BinaryField(Poly([1, 0, 0, 0, 1, 1, 0, 1, 1], Symbol('X')))
+        muls = []
+        square_and_multiply(0x53, 2**10 - 1, F.one, lambda x, y: muls.append(1) or F.mul(x, y), 1)
+        with ops_profile(F, ops=('mul', 'pow')) as stats:
+            F.pow(0x53, 2**10 - 1, window=1)
+        self.assertEqual(stats['pow'].calls, 1)
+        self.assertEqual(stats['mul'].calls, len(muls))
+        self.assertGreaterEqual(stats['pow'].time, stats['mul'].time)
+        self.assertIn('mul', stats.table())
+
+    def test_sample(self):
+        from .base import Integers
+        with ops_profile(Integers, sample=10) as stats:
+            for i in range(95):
+                Integers.add(i, 1)
+        self.assertEqual(stats['add'].calls, 95)
+        self.assertEqual(stats['add'].timed, 9)
+        self.assertNotIn('add', Integers.__dict__)
+
+    def test_restores(self):
+        from .prime import PrimeField
+        F = PrimeField(7)
+        with ops_profile(F) as outer:
+            with ops_profile(F) as inner:
+                F.mul(3, 5)
+            F.mul(2, 2)
+        self.assertEqual((inner['mul'].calls, outer['mul'].calls), (1, 2))
+        self.assertEqual(F.__dict__.keys() & set(OPS), set())
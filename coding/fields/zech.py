@@ -0,0 +1,208 @@
+
+import math
+
+import numpy as np
+
+from coding.util import Poly, Symbol
+from .base import Integers
+from .finite import FiniteField, index_dtype
+
+
+class ZechField(FiniteField):
+    """Finite field represented by the powers of a primitive element `a`.
+
+    Instead of q² addition and multiplication tables, only O(q) tables are kept:
+    `exp[i] = a^i`, its inverse `log`, and the Zech logarithms `zech[n]`, defined
+    by `1 + a^n = a^zech[n]` (`None` when `1 + a^n = 0`). Multiplication is then
+    addition of logarithms, and addition uses `a^i + a^j = a^(i + zech[j-i])`.
+    """
+
+    def __init__(self, zero, exp, zech, element_str=None):
+        """Create a ZechField. Not meant to be used directly."""
+
+        assert zero not in exp
+        assert len(exp) == len(zech)
+        self.zero = zero
+        self.one = exp[0]
+        self.exp = exp
+        self.log = {x: i for i, x in enumerate(exp)}
+        self.zech = zech
+        self.numbers = frozenset(exp) | {zero}
+        # -1 = a^n, with n the (only) Zech logarithm that is undefined
+        self._log_neg_one = zech.index(None)
+        if element_str is not None:
+            self.element_str = element_str
+
+
+    # Operations ..........................................
+
+    def add(self, x, y):
+        if x == self.zero: return y
+        if y == self.zero: return x
+        m = len(self.exp)
+        i = self.log[x]
+        z = self.zech[(self.log[y] - i) % m]
+        return self.zero if z is None else self.exp[(i + z) % m]
+
+    def neg(self, x):
+        if x == self.zero: return x
+        return self.exp[(self.log[x] + self._log_neg_one) % len(self.exp)]
+
+    def mul(self, x, y):
+        if x == self.zero or y == self.zero: return self.zero
+        return self.exp[(self.log[x] + self.log[y]) % len(self.exp)]
+
+    def inv(self, x):
+        # Raises a KeyError for zero, just like FiniteField
+        return self.exp[-self.log[x] % len(self.exp)]
+
+    def pow(self, x, n: int, window=None):
+        if x == self.zero: return self.one if n == 0 else self.zero
+        return self.exp[(self.log[x] * n) % len(self.exp)]
+
+
+    def order(self, x):
+        if x == self.zero:
+            raise ValueError("zero has no multiplicative order")
+        m = len(self.exp)
+        return m // math.gcd(self.log[x], m)
+
+    def is_generator(self, x):
+        return x != self.zero and self.order(x) == len(self.exp)
+
+    def primitive_element(self):
+        return self.exp[1 % len(self.exp)]
+
+    def _dense_tables(self, rows=256):
+        # Same as FiniteField._dense_tables, but with index arithmetic in NumPy
+        q, m, idx = len(self), len(self.exp), self.index
+        dtype = index_dtype(q)
+        exp = np.array([idx[x] for x in self.exp], dtype=np.int64)
+        log = np.array([0] + [self.log[x] for x in self.elements[1:]], dtype=np.int64)
+        zech = np.array([-1 if z is None else z for z in self.zech], dtype=np.int64)
+
+        add = np.empty((q, q), dtype=dtype)
+        mul = np.empty((q, q), dtype=dtype)
+        for start in range(0, q, rows):  # a few rows at a time, to bound memory
+            i = log[start:start+rows, None]
+            mul[start:start+rows] = exp[(i + log[None, :]) % m]
+            z = zech[(log[None, :] - i) % m]
+            add[start:start+rows] = np.where(z < 0, 0, exp[(i + z) % m])
+        add[0, :] = add[:, 0] = np.arange(q)
+        mul[0, :] = mul[:, 0] = 0
+        neg = exp[(log + self._log_neg_one) % m].astype(dtype)
+        inv = exp[-log % m].astype(dtype)
+        neg[0] = inv[0] = 0
+        return {'add': add, 'mul': mul, 'neg': neg, 'inv': inv}
+
+
+    # Constructing ........................................
+
+    @classmethod
+    def modulo(cls, p, F=Integers):
+        """Creates a ZechField based on modulo. Like `FiniteField.modulo`, but only
+        O(q) multiplications are needed. Raises a ValueError if `p` isn't prime.
+        """
+
+        assert p in F, f'given prime {p} has to be an element of the given field {F}'
+        return cls.from_operations(F.all_mod(p), F.zero, F.one,
+                                   lambda a, b: F.mod(F.add(a, b), p),
+                                   lambda a, b: F.mod(F.mul(a, b), p))
+
+    @classmethod
+    def from_field(cls, F):
+        """Creates a ZechField from the operations of another finite Field `F`."""
+        return cls.from_operations(set(F), F.zero, F.one, F.add, F.mul,
+                                   element_str=F.element_str)
+
+    @classmethod
+    def from_operations(cls, numbers, zero, one, add, mul, element_str=None):
+        """Creates a ZechField from its elements and the binary functions `add`
+        and `mul`, by looking for a primitive element.
+        """
+
+        q = len(numbers)
+        for g in numbers - {zero}:
+            exp = [one]
+            x = g
+            while x != one:
+                # In a field, the powers of every nonzero element end up in one
+                if x == zero or len(exp) == q:
+                    raise ValueError(f"{g} is not invertible, this is not a field")
+                exp.append(x)
+                x = mul(x, g)
+            if len(exp) == q - 1:
+                break
+        else:
+            raise ValueError("No primitive element found, this is not a field")
+
+        log = {x: i for i, x in enumerate(exp)}
+        zech = [log.get(add(one, x)) for x in exp]
+        return cls(zero, exp, zech, element_str)
+
+
+
+import unittest
+
+class ZechFieldTests(unittest.TestCase):
+    def test_integer_fields(self):
+        for p in [2, 3, 7, 11, 31]:
+            ff = ZechField.modulo(p)
+            self.assertTrue(ff.check())
+
+    def test_integer_fields_not_prime(self):
+        for p in [4, 8, 100]:
+            with self.assertRaises(ValueError):
+                ff = ZechField.modulo(p)
+
+    def test_same_as_tables(self):
+        ff = FiniteField.modulo(13)
+        zf = ZechField.modulo(13)
+        for a in ff:
+            self.assertEqual(ff.neg(a), zf.neg(a))
+            if a != ff.zero:
+                self.assertEqual(ff.inv(a), zf.inv(a))
+            for b in ff:
+                self.assertEqual(ff.add(a, b), zf.add(a, b))
+                self.assertEqual(ff.mul(a, b), zf.mul(a, b))
+
+    def test_inv_zero(self):
+        zf = ZechField.modulo(5)
+        with self.assertRaises(KeyError):
+            zf.inv(0)
+
+    def test_poly_field_16(self):
+        g = Poly([1, 0, 0, 1, 1], Symbol('X'))
+        ff = ZechField.modulo_poly(2, g)
+        self.assertEqual(len(ff), 16)
+        self.assertTrue(ff.check())
+
+    def test_poly_field_27(self):
+        g = Poly([1, 0, 2, 2], Symbol('X'))
+        ff = ZechField.modulo_poly(3, g)
+        self.assertTrue(ff.check())
+
+    def test_not_poly_field_simple(self):
+        g = Poly([1, 0, 1], Symbol('X'))
+        with self.assertRaises(ValueError):
+            ff = ZechField.modulo_poly(2, g)
+
+    def test_packed(self):
+        g = Poly([1, 0, 0, 0, 1, 1, 0, 1, 1], Symbol('X'))
+        ff = ZechField.modulo_poly(2, g, packed=True)
+        self.assertEqual(len(ff), 256)
+        self.assertEqual(ff.mul(0x57, 0x83), 0xc1)
+
+    def test_dense_tables(self):
+        zf = ZechField.modulo_poly(3, Poly([1, 0, 2, 2], Symbol('X')))
+        tables = zf.tables
+        expected = FiniteField._dense_tables(zf)
+        for name in ['add', 'mul', 'neg', 'inv']:
+            self.assertTrue(np.array_equal(tables[name], expected[name]), name)
+
+    def test_order(self):
+        zf = ZechField.modulo(31)
+        ff = FiniteField.modulo(31)
+        for x in range(1, 31):
+            self.assertEqual(zf.order(x), ff.order(x))
+        self.assertEqual(zf.mul_generators(), ff.mul_generators())
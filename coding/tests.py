@@ -15,7 +15,9 @@ if "--all" in sys.argv:
 
 from .fields import *
 from .util import *
+from .util.algos import AlgosTests
 from .dlp import *
+from .bench import BenchTests
 
 if __name__ == '__main__':
     unittest.main(buffer=True)
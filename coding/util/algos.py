@@ -1,19 +1,68 @@
 
+from itertools import count
+import math
+
 from coding.util.table import as_rest_table
+from coding.util.etc import lru_memoize, instance_memoize
 
-__all__ = ['euclides']
+__all__ = ['euclides', 'is_prime', 'primes_up_to', 'factorize', 'totient']
 
 def euclides(a: int, b: int, F=None, output=False) -> 'd, s, t':
     """Algorithm of Euclides. Given two numbers `a` and `b`, calculates their greatest
     common denominator `d`, and tells you how to write `d` as `s*a + t*b`.
+    
+    Only the full history is kept when it is printed (`output`). Large integers use
+    Lehmer's algorithm, and fields that have a `fast_euclides` (like
+    DensePolynomialField) use it for large inputs. These all give the same result.
+    Results are cached per field instance (see `instance_memoize`), use
+    `euclides.cache_clear(F)` after changing the operations of F.
     """
     
     if F is None:  # avoid circular imports
         from coding.fields.base import Integers
         F = Integers
+    if output:
+        return _euclides(a, b, F, output)
+    return _euclides_cached(a, b, F)
+
+
+def _euclides(a, b, F, output=False):
+    r0 = max(a, b, key=F.key)
+    r1 = min(a, b, key=F.key)
     
-    r = {0: max(a, b, key=F.key),
-         1: min(a, b, key=F.key)}
+    if output:
+        d, s, t = _euclides_history(a, b, r0, r1, F)
+    elif _lehmer_applies(r0, r1, F):
+        d, s, t = _lehmer(r0, r1)
+    elif hasattr(F, 'fast_euclides') and F.key(r1) > F.hgcd_threshold:
+        d, s, t = F.fast_euclides(r0, r1)
+    else:
+        d, s, t = _euclides_loop(r0, r1, F)
+    
+    if d != F.one:
+        return F.neg(d), F.neg(s), F.neg(t)
+    else:
+        return d, s, t
+
+_euclides_cached = instance_memoize('F', maxsize=1024)(_euclides)
+euclides.cache_clear = _euclides_cached.cache_clear
+
+
+def _euclides_loop(r0, r1, F):
+    "Plain algorithm of Euclides, keeping only the last two rows"
+    s0, s1 = F.one, F.zero
+    t0, t1 = F.zero, F.one
+    while r1 != F.zero:
+        quotient, r2 = F.divmod(r0, r1)
+        r0, r1 = r1, r2
+        s0, s1 = s1, F.add(F.mul(F.neg(quotient), s1), s0)
+        t0, t1 = t1, F.add(F.mul(F.neg(quotient), t1), t0)
+    return r0, s0, t0
+
+
+def _euclides_history(a, b, r0, r1, F):
+    "Algorithm of Euclides, printing all steps"
+    r = {0: r0, 1: r1}
     s = {0: F.one, 1: F.zero}
     t = {0: F.zero, 1: F.one}
     
@@ -24,15 +73,189 @@ def euclides(a: int, b: int, F=None, output=False) -> 'd, s, t':
         t[i+1] = F.add(F.mul(F.neg(quotient), t[i]), t[i-1])
         i += 1
     
-    if output:
-        data = [['i', 's', 't', 'r']]
-        for k in range(i):
-            data.append([str(k), str(s[k]), str(t[k]), str(r[k])])
-        print(f"Euclides algo, given a = {a}, b = {b}")
-        print()
-        print(as_rest_table(data))
-    
-    if r[i-1] != F.one:
-        return F.neg(r[i-1]), F.neg(s[i-1]), F.neg(t[i-1])
-    else:
-        return r[i-1], s[i-1], t[i-1]
+    data = [['i', 's', 't', 'r']]
+    for k in range(i):
+        data.append([str(k), str(s[k]), str(t[k]), str(r[k])])
+    print(f"Euclides algo, given a = {a}, b = {b}")
+    print()
+    print(as_rest_table(data))
+    
+    return r[i-1], s[i-1], t[i-1]
+
+
+# Integers with at least this many bits use Lehmer's algorithm
+LEHMER_THRESHOLD = 64
+
+def _lehmer_applies(r0, r1, F):
+    from coding.fields.base import _IntegerField
+    return isinstance(F, _IntegerField) and isinstance(r0, int) and isinstance(r1, int) \
+            and r1 > 0 and r1.bit_length() >= LEHMER_THRESHOLD
+
+
+def _lehmer(a: int, b: int, digit=62):
+    """Lehmer's extended gcd for a >= b >= 0 (Knuth, TAOCP vol. 2, algorithm 4.5.2L).
+    Most quotients are found from the leading `digit` bits only, but they are the
+    same as those of the plain algorithm, and so are `d`, `s` and `t`.
+    """
+    
+    s0, s1, t0, t1 = 1, 0, 0, 1
+    while b.bit_length() > digit:
+        shift = a.bit_length() - digit
+        ah, bh = a >> shift, b >> shift
+        A, B, C, D = 1, 0, 0, 1
+        while bh + C != 0 and bh + D != 0:
+            q = (ah + A) // (bh + C)
+            if q != (ah + B) // (bh + D):
+                break
+            A, C = C, A - q*C
+            B, D = D, B - q*D
+            ah, bh = bh, ah - q*bh
+        
+        if B == 0:  # No quotient could be determined, do a full step
+            q, r = divmod(a, b)
+            a, b = b, r
+            s0, s1 = s1, s0 - q*s1
+            t0, t1 = t1, t0 - q*t1
+        else:
+            a, b = A*a + B*b, C*a + D*b
+            s0, s1 = A*s0 + B*s1, C*s0 + D*s1
+            t0, t1 = A*t0 + B*t1, C*t0 + D*t1
+    
+    while b:
+        q, r = divmod(a, b)
+        a, b = b, r
+        s0, s1 = s1, s0 - q*s1
+        t0, t1 = t1, t0 - q*t1
+    return a, s0, t0
+
+
+def is_prime(n: int) -> bool:
+    """Miller-Rabin primality test. Deterministic for n < 3.3 * 10^24, and
+    wrong with a negligible probability above that.
+    """
+    
+    if n < 2:
+        return False
+    small = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+    for b in small:
+        if n % b == 0:
+            return n == b
+    
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for b in small:
+        x = pow(b, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def primes_up_to(n: int) -> list:
+    "All primes <= n, with the sieve of Eratosthenes"
+    if n < 2:
+        return []
+    sieve = bytearray([1]) * (n + 1)
+    sieve[0] = sieve[1] = 0
+    for i in range(2, math.isqrt(n) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = bytes(len(range(i*i, n + 1, i)))
+    return [i for i, prime in enumerate(sieve) if prime]
+
+
+def factorize(n: int) -> dict:
+    """Prime factorization of n > 0, as a dict {prime: exponent}. Small factors are
+    found by trial division, the others with Pollard's rho. Factorizations are
+    cached, so asking again for the order of the same group is free.
+    """
+    return dict(_factorize(n))
+
+
+@lru_memoize(maxsize=256)
+def _factorize(n: int) -> tuple:
+    factors = {}
+    def add(p):
+        factors[p] = factors.get(p, 0) + 1
+    
+    for d in [2] + list(range(3, 1000, 2)):
+        while n % d == 0:
+            add(d)
+            n //= d
+    
+    todo = [n] if n > 1 else []
+    while todo:
+        m = todo.pop()
+        if is_prime(m):
+            add(m)
+        else:
+            d = _pollard_rho(m)
+            todo += [d, m // d]
+    return tuple(sorted(factors.items()))
+
+
+def totient(n: int) -> int:
+    "Euler's totient function: the number of units modulo n > 0"
+    res = n
+    for p in factorize(n):
+        res = res // p * (p - 1)
+    return res
+
+
+def _pollard_rho(n: int) -> int:
+    "A nontrivial factor of the odd composite n (Brent's variant of Pollard's rho)"
+    
+    for c in count(1):
+        y, r, q, g = 2, 1, 1, 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(128, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += 128
+            r *= 2
+        if g == n:  # Overshot, backtrack one step at a time
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+
+
+
+import unittest
+import random
+
+class AlgosTests(unittest.TestCase):
+    def test_euclides_paths(self):
+        # Lehmer's algorithm and the plain loop give the same (d, s, t) as the history
+        import io
+        from contextlib import redirect_stdout
+        from coding.fields.base import Integers
+        rnd = random.Random(10)
+        lehmer = 0
+        for _ in range(500):
+            bits = rnd.randrange(LEHMER_THRESHOLD + 1, 4 * LEHMER_THRESHOLD)
+            a = rnd.choice([1, -1]) * (rnd.getrandbits(bits) | 1 << (bits - 1))
+            b = rnd.choice([1, -1]) * rnd.getrandbits(rnd.randrange(LEHMER_THRESHOLD + 1, bits + 1))
+            r0, r1 = max(a, b, key=Integers.key), min(a, b, key=Integers.key)
+            with redirect_stdout(io.StringIO()):
+                expected = _euclides_history(a, b, r0, r1, Integers)
+            self.assertEqual(_euclides_loop(r0, r1, Integers), expected, (a, b))
+            if _lehmer_applies(r0, r1, Integers):
+                lehmer += 1
+                self.assertEqual(_lehmer(r0, r1), expected, (a, b))
+        self.assertGreater(lehmer, 100)
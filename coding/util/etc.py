@@ -2,7 +2,11 @@
 """
 
 from functools import update_wrapper
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+import inspect
+import threading
+import time
+import weakref
 
 class memoize(dict):
     "Memoization decorator for functions taking one or more arguments."
@@ -18,6 +22,175 @@ class memoize(dict):
         return ret
 
 
+class CacheInfo:
+    "Statistics of an LRUCache"
+    def __init__(self, hits, misses, evictions, expired, size, maxsize):
+        self.hits, self.misses = hits, misses
+        self.evictions = evictions  # dropped because the cache was full
+        self.expired = expired  # dropped because they were older than the TTL
+        self.size, self.maxsize = size, maxsize
+    
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    __str__ = __repr__ = lambda s: (f'CacheInfo(hits={s.hits}, misses={s.misses}, '
+                                    f'evictions={s.evictions}, expired={s.expired}, '
+                                    f'size={s.size}/{s.maxsize})')
+
+
+class LRUCache:
+    """A mapping that keeps at most `maxsize` entries, and drops the least recently
+    used one when it is full. With a `ttl` (in seconds), entries also expire that
+    long after they were stored. All operations are thread safe.
+    """
+    
+    timer = staticmethod(time.monotonic)
+    
+    def __init__(self, maxsize=128, ttl=None):
+        if maxsize is not None and maxsize < 1:
+            raise ValueError(f"maxsize should be at least 1, not {maxsize}")
+        self.maxsize = maxsize  # None means unbounded
+        self.ttl = ttl
+        self._data = OrderedDict()  # key: (value, expiry time or None)
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.evictions = self.expired = 0
+    
+    def get(self, key, default=None):
+        "The value for `key`, or `default` if it isn't there (anymore). Counts a hit or miss."
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= self.timer():
+                del self._data[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key, value):
+        with self._lock:
+            expiry = None if self.ttl is None else self.timer() + self.ttl
+            self._data[key] = (value, expiry)
+            self._data.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+    
+    def clear(self):
+        "Drops all entries and resets the statistics"
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = self.expired = 0
+    
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, self.expired,
+                             len(self._data), self.maxsize)
+    
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > self.timer())
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def __reduce__(self):
+        # Copies (e.g. for other processes) start empty, and get a lock of their own
+        return LRUCache, (self.maxsize, self.ttl)
+
+
+_missing = object()
+
+def lru_memoize(maxsize=128, ttl=None):
+    """Memoization decorator like `memoize`, but with an LRUCache: it holds at most
+    `maxsize` results, for at most `ttl` seconds. The cache is available as the
+    `cache` attribute of the decorated function, and its statistics with
+    `cache_info()`. Calls with unhashable arguments bypass the cache. The
+    undecorated function is `__wrapped__`.
+    
+    The function is called without holding the lock, so two threads that miss
+    the same key at the same time both compute it.
+    """
+    def decorator(f):
+        cache = LRUCache(maxsize, ttl)
+        
+        def wrapper(*args, **kwargs):
+            key = args if not kwargs else args + (_missing,) + tuple(sorted(kwargs.items()))
+            try:
+                value = cache.get(key, _missing)
+            except TypeError:  # unhashable
+                return f(*args, **kwargs)
+            if value is _missing:
+                value = f(*args, **kwargs)
+                cache.put(key, value)
+            return value
+        
+        update_wrapper(wrapper, f)
+        wrapper.cache = cache
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
+
+def instance_memoize(name, maxsize=128, ttl=None):
+    """Memoization decorator like `lru_memoize`, but with an LRUCache for every
+    instance passed as the argument `name` (e.g. a field). The caches are stored
+    on the instances, so they live exactly as long as those, and don't keep them
+    alive. `cache_clear(obj)` drops the cache of one instance (e.g. after its
+    operations were changed), and `cache_clear()` all of them. `cache_info(obj)`
+    gives the statistics of one cache, `cache_info()` the totals.
+    """
+    def decorator(f):
+        params = list(inspect.signature(f).parameters.values())
+        index = [param.name for param in params].index(name)
+        default = params[index].default
+        attr = f'_memo_{f.__name__}'
+        instances = weakref.WeakSet()
+        
+        def wrapper(*args, **kwargs):
+            obj = args[index] if len(args) > index else kwargs.get(name, default)
+            cache = obj.__dict__.get(attr)
+            if cache is None:
+                cache = LRUCache(maxsize, ttl)
+                setattr(obj, attr, cache)
+                instances.add(obj)
+            key = args if not kwargs else args + (_missing,) + tuple(sorted(kwargs.items()))
+            try:
+                value = cache.get(key, _missing)
+            except TypeError:  # unhashable
+                return f(*args, **kwargs)
+            if value is _missing:
+                value = f(*args, **kwargs)
+                cache.put(key, value)
+            return value
+        
+        def cache_info(obj=None) -> CacheInfo:
+            caches = [obj.__dict__.get(attr)] if obj is not None else \
+                [o.__dict__.get(attr) for o in list(instances)]
+            infos = [c.info() for c in caches if c is not None]
+            return CacheInfo(*(sum(getattr(i, field) for i in infos) for field in
+                               ('hits', 'misses', 'evictions', 'expired', 'size')), maxsize)
+        
+        def cache_clear(obj=None):
+            for o in [obj] if obj is not None else list(instances):
+                o.__dict__.pop(attr, None)
+                instances.discard(o)
+        
+        update_wrapper(wrapper, f)
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+
 class multimap(defaultdict):
     def __init__(self, *a, **kw):
         super().__init__(set, *a, **kw)
@@ -66,9 +239,103 @@ def defzip(default, *iters):
 
 
 import unittest
+import pickle
 
 class EtcTests(unittest.TestCase):
     def test_defzip(self):
         self.assertEqual(list(defzip(5, [1, 2], [1, 2, 3, 4])), [(1,1), (2,2), (5,3), (5,4)])
+    
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)  # now b is the least recently used
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('b', 'gone'), 'gone')
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses, info.evictions, info.size), (1, 1, 1, 2))
+        self.assertEqual(info.hit_rate, 0.5)
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertEqual((len(copy), copy.maxsize), (0, 2))
+    
+    def test_lru_cache_ttl(self):
+        now = [0.0]
+        cache = LRUCache(10, ttl=5)
+        cache.timer = lambda: now[0]
+        cache.put('a', 1)
+        now[0] = 4.9
+        self.assertEqual(cache.get('a'), 1)
+        now[0] = 5.0
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.info().expired, 1)
+        self.assertEqual(len(cache), 0)
+    
+    def test_lru_memoize(self):
+        calls = []
+        @lru_memoize(maxsize=3)
+        def square(x, offset=0):
+            calls.append(x)
+            return x * x + offset
+        
+        self.assertEqual([square(i % 4) for i in range(8)], [0, 1, 4, 9] * 2)
+        self.assertEqual(len(calls), 8)  # cycling through 4 keys thrashes 3 slots
+        self.assertEqual(square(3), 9)
+        self.assertEqual(square(3, offset=1), 10)
+        self.assertEqual(square.cache_info().hits, 1)
+        self.assertEqual(square.__name__, 'square')
+        square.cache_clear()
+        self.assertEqual(square.cache_info().size, 0)
+    
+    def test_lru_memoize_unhashable(self):
+        @lru_memoize()
+        def total(xs):
+            return sum(xs)
+        self.assertEqual(total([1, 2, 3]), 6)
+        self.assertEqual(total.cache_info().size, 0)
+        self.assertEqual(total.cache_info().misses, 0)
+    
+    def test_instance_memoize(self):
+        import gc
+        class Thing:
+            pass
+        
+        calls = []
+        @instance_memoize('thing', maxsize=2)
+        def f(x, thing=None):
+            calls.append(x)
+            return x + 1
+        
+        a, b = Thing(), Thing()
+        self.assertEqual([f(1, a), f(1, a), f(1, b), f(2, thing=a)], [2, 2, 2, 3])
+        self.assertEqual(len(calls), 3)  # one cache per thing
+        self.assertEqual(f.cache_info(a).size, 2)
+        self.assertEqual(f.cache_info().hits, 1)
+        f.cache_clear(a)
+        self.assertEqual((f.cache_info(a).size, f.cache_info(b).size), (0, 1))
+        f(1, a)
+        self.assertEqual(len(calls), 4)
+        
+        ref = weakref.ref(b)
+        del b
+        gc.collect()
+        self.assertIsNone(ref())
+        f.cache_clear()
+        self.assertEqual(f.cache_info().size, 0)
+    
+    def test_lru_memoize_threads(self):
+        @lru_memoize(maxsize=50)
+        def double(x):
+            return 2 * x
+        
+        def work():
+            for i in range(2000):
+                self.assertEqual(double(i % 100), 2 * (i % 100))
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        info = double.cache_info()
+        self.assertEqual(info.hits + info.misses, 8000)
+        self.assertLessEqual(info.size, 50)
 
         
@@ -1,3 +1,4 @@
+import io
 import string
 
 # taken from https://code.activestate.com/recipes/579054-generate-sphinx-table/
@@ -29,10 +30,32 @@ def as_rest_table(data, full=False):
     """
     
     data = data if data else [['No Data']]
-    table = []
-    # max size of each column
-    sizes = list(map(max, zip(*[[len(str(elt)) for elt in member]
-                           for member in data])))
+    buf = io.StringIO()
+    write_rest_table(buf, data, column_sizes(data), full)
+    return buf.getvalue()[:-1]
+
+
+def column_sizes(rows) -> list:
+    """Width of each column of `rows`, any iterable of rows. It is consumed in a
+    single pass, without keeping the rows around.
+    """
+    sizes = []
+    for row in rows:
+        for i, elt in enumerate(row):
+            n = len(str(elt))
+            if i == len(sizes):
+                sizes.append(n)
+            elif n > sizes[i]:
+                sizes[i] = n
+    return sizes
+
+
+def write_rest_table(file, rows, sizes, full=False):
+    """Writes `rows` (an iterable, starting with the titles) to the file object
+    `file` like `as_rest_table`, one line at a time, so the rows can come from a
+    generator. `sizes` are the widths of the columns, e.g. from `column_sizes`.
+    """
+    
     num_elts = len(sizes)
 
     if full:
@@ -71,17 +94,59 @@ def as_rest_table(data, full=False):
     th_separator = '{0}{1}{2}'.format(start_of_line,
                                       vertical_separator.join([x*line_marker for x in sizes]),
                                       end_of_line)
-    # prepare result
-    table.append(separator)
+    
+    rows = iter(rows)
+    file.write(separator + '\n')
     # set table header
-    titles = data[0]
-    table.append(template.format(*titles))
-    table.append(th_separator)
-
-    for d in data[1:-1]:
-        table.append(template.format(*d))
-        if full:
-            table.append(separator)
-    table.append(template.format(*data[-1]))
-    table.append(separator)
-    return '\n'.join(table)
+    titles = next(rows)
+    file.write(template.format(*titles) + '\n')
+    file.write(th_separator + '\n')
+
+    # like the original recipe, a table without data repeats the titles as its row
+    last = None
+    for d in rows:
+        if full and last is not None:
+            file.write(separator + '\n')
+        last = template.format(*d)
+        file.write(last + '\n')
+    if last is None:
+        file.write(template.format(*titles) + '\n')
+    file.write(separator + '\n')
+
+
+
+import unittest
+
+class TableTests(unittest.TestCase):
+    def test_old_output(self):
+        # the tables of the original recipe, which kept all rows in memory
+        self.assertEqual(as_rest_table([]), '\n'.join([
+            '=======', 'No Data', '=======', 'No Data', '=======']))
+        self.assertEqual(as_rest_table([['a', 'b']], full=True), '\n'.join([
+            '+---+---+', '| a | b |', '+===+===+', '| a | b |', '+---+---+']))
+        self.assertEqual(as_rest_table([['a', 'b'], [1, 22]], full=True), '\n'.join([
+            '+---+----+', '| a | b  |', '+===+====+', '| 1 | 22 |', '+---+----+']))
+        data = [('what', 'how'), ('lorem', 'long value'), ('ipsum', 89798)]
+        self.assertEqual(as_rest_table(data, full=True), '\n'.join([
+            '+-------+------------+',
+            '| what  | how        |',
+            '+=======+============+',
+            '| lorem | long value |',
+            '+-------+------------+',
+            '| ipsum |      89798 |',
+            '+-------+------------+']))
+        self.assertEqual(as_rest_table(data), '\n'.join([
+            '=====  ==========',
+            'what   how       ',
+            '=====  ==========',
+            'lorem  long value',
+            'ipsum       89798',
+            '=====  ==========']))
+
+    def test_generator(self):
+        import io
+        data = [['x', 'x^2']] + [[i, i * i] for i in range(5)]
+        buf = io.StringIO()
+        write_rest_table(buf, iter(data), column_sizes(data), full=True)
+        self.assertEqual(buf.getvalue()[:-1], as_rest_table(data, full=True))
+        self.assertTrue(buf.getvalue().endswith('+---+-----+\n'))